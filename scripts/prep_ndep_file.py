@@ -4,8 +4,12 @@ Spyder Editor
 
 This is a temporary script file.
 """
+import os
 import xarray as xr
 import pandas as pd
+import numpy as np
+import netCDF4
+from concurrent.futures import ProcessPoolExecutor
 
 
 def prep_ndep(path, year):
@@ -55,25 +59,121 @@ def prep_ndep(path, year):
     return nc_nhx, nc_noy
 
 
+def convert_year(path, year):
+    """Convert N-deposition of one year (process of the batch driver). Only
+       numpy arrays and attributes of coordinates are returned to the main
+       process"""
+    nhx, noy = prep_ndep(path, year)
+    return (
+        nhx.time.values,
+        nhx.transpose('time', 'lat', 'lon').values,
+        noy.transpose('time', 'lat', 'lon').values,
+        nhx.lat.values,
+        nhx.lon.values,
+        {'lat': dict(nhx.lat.attrs), 'lon': dict(nhx.lon.attrs)},
+    )
+
+
+def create_output(
+    # Input parameters:
+    pout:str,                        # Output path
+    lat:np.array,                    # Latitudes
+    lon:np.array,                    # Longitudes
+    dtype:np.dtype,                  # Type of deposition data
+    attrs:dict = None,               # Attributes of coordinates (lat, lon) from input files
+    # Output parameters:
+    ) -> netCDF4.Dataset:            # Output file with unlimited time axis
+    """Create NetCDF4 file for merged N-deposition (one month in one chunk,
+       compressed variables, CF attributes of coordinates)"""
+    attrs = attrs or {}
+    nc = netCDF4.Dataset(pout, 'w', format = 'NETCDF4')
+    nc.createDimension('time', None)
+    nc.createDimension('lat', lat.size)
+    nc.createDimension('lon', lon.size)
+    nc_time = nc.createVariable('time', 'f8', ('time',))
+    nc_time.units = 'days since 1850-01-01 00:00:00'
+    nc_time.calendar = 'standard'
+    nc_time.standard_name = 'time'
+    nc_time.long_name = 'time'
+    nc_time.axis = 'T'
+    # -- Coordinates with attributes of input files (CF attributes are added,
+    #    if they aren't presented in input files):
+    defaults = {
+        'lat': {'units': 'degrees_north', 'standard_name': 'latitude', 'axis': 'Y'},
+        'lon': {'units': 'degrees_east', 'standard_name': 'longitude', 'axis': 'X'},
+    }
+    for name, values in (('lat', lat), ('lon', lon)):
+        nc_coord = nc.createVariable(name, values.dtype, (name,))
+        nc_coord[:] = values
+        nc_coord.setncatts({
+            key: val for key, val in {**defaults[name], **attrs.get(name, {})}.items()
+            if key != '_FillValue'
+        })
+    for var in ('NHx_deposition', 'NOy_deposition'):
+        nc_var = nc.createVariable(
+            var, dtype, ('time', 'lat', 'lon'),
+            zlib = True, complevel = 4, shuffle = True,
+            chunksizes = (1, lat.size, lon.size),
+        )
+        nc_var.units = 'mg/m2/month'
+    return nc
+
+
+def prep_ndep_batch(
+    # Input parameters:
+    path:str,                        # Folder with annual files (ndep_<year>.nc)
+    pout:str,                        # Output path of merged file
+    years:list[int],                 # Years for preprocessing
+    nproc:int = None,                # Number of processes (default: all cores)
+    max_years:int = None,            # Max number of years in memory (default: 2 * nproc)
+    ):
+    """Convert N-deposition of all years in a pool of processes and append
+       them in order of years to one NetCDF4 file"""
+    years = list(years)
+    nproc = nproc or os.cpu_count()
+    max_years = max_years or 2 * nproc
+    nc = None
+    try:
+        with ProcessPoolExecutor(max_workers = nproc) as pool:
+            futures = {}
+            nsubmit = 0
+            for i, year in enumerate(years):
+                # -- Submit new years (years in processes and not written years
+                #    are limited by max_years):
+                while nsubmit < len(years) and nsubmit - i < max_years:
+                    futures[nsubmit] = pool.submit(convert_year, path, years[nsubmit])
+                    nsubmit += 1
+                time, nhx, noy, lat, lon, attrs = futures.pop(i).result()
+                if nc is None:
+                    nc = create_output(pout, lat, lon, nhx.dtype, attrs)
+                # -- Append year to the end of time axis:
+                t0 = len(nc.dimensions['time'])
+                nc['time'][t0:] = netCDF4.date2num(
+                    pd.to_datetime(time).to_pydatetime(),
+                    nc['time'].units,
+                    nc['time'].calendar,
+                )
+                nc['NHx_deposition'][t0:] = nhx
+                nc['NOy_deposition'][t0:] = noy
+                print(f'N-deposition for {year} is ready')
+    finally:
+        if nc is not None:
+            nc.close()
+
+
 if __name__ == '__main__':
     
     # Input and output parameters
     pin  = 'C:/Users/evchur/Desktop/masks/N-P_deposition/NDEP'
     pout = 'C:/Users/evchur/Desktop/masks/N-P_deposition/test'
-    act_year = 1850
-    
-    # Get data:
-    nhx, noy = prep_ndep(pin, act_year)
+    year_start = 1850
+    year_stop = 2021
+    nproc = None                     # Number of processes (None - all cores)
     
-    # Create output dataset:
-    ds = xr.Dataset(
-        data_vars = {
-            'lon'  : nhx.lon, 'lat'  : nhx.lat, 'time' : nhx.time,
-            'NHx_deposition' : nhx, 'NOy_deposition' : noy,
-        },
+    # Convert data of all years and merge them in one file:
+    prep_ndep_batch(
+        pin,
+        pout + f'/ndep_{year_start}_{year_stop}.nc',
+        range(year_start, year_stop + 1),
+        nproc = nproc,
     )
-
-    # write to file
-    ds.to_netcdf(pout + f'/ndep_{act_year}.nc')
-    
-
@@ -17,10 +17,40 @@ Version    Date       Name
 
 #=============================     Import modules     ==========================
 # 1.1: Standard modules
+import numpy as np
 import pandas as pd
 import xarray as xr
 import sys
 
+def expand_monthly(
+    # Input variables:
+    data:xr.DataArray,               # Annual field without time axis (e.g. lat, lon)
+    year:int,                        # Year of monthly time steps
+    factor:float = 1.0,              # Factor for conversion of annual values to monthly values
+    weights:np.array = None,         # Monthly weights (12 values, e.g. days in month), optional
+    lview:bool = True,               # Zero-copy broadcast view (copied only at write time)
+    time_axis:str = 'time',          # Name of time axis
+    # Output variables:
+    ) -> xr.DataArray:               # Monthly field (time, ...), time - ends of months
+    """Expand annual field to 12 monthly time steps by numpy broadcasting.
+       Without weights all months are views of one converted annual field"""
+    values = np.asarray(data.values * factor)
+    if weights is None:
+        monthly = np.broadcast_to(values, (12,) + values.shape)
+        if not lview:
+            monthly = monthly.copy()
+    else:
+        monthly = values * np.asarray(weights).reshape((12,) + (1,) * values.ndim)
+    coords = dict(data.coords)
+    coords[time_axis] = pd.date_range(f'{year}-01-31', periods = 12, freq = pd.offsets.MonthEnd())
+    return xr.DataArray(
+        monthly,
+        dims = (time_axis,) + data.dims,
+        coords = coords,
+        name = data.name,
+    )
+
+
 def check_before(ds_orig, var):
     return ds_orig[var].sum(dim = {'lat', 'lon'}).data
 
@@ -32,33 +62,11 @@ def check_after(ds_new):
 
 def get_var(ds_orig, var):
     
-    # Create monthly time steps:
-    years = pd.date_range('1850-01-01', '1851-01-01', freq = '1M')
-    
-    # Get actual values for parameter:
-    lats    = ds_orig.lat
-    lons    = ds_orig.lon
-    ds_orig = ds_orig[var]    
-    
-    list4month = []
-    for tstep in range(len(years)):
-       
-        # Convert data from annual to monthly timestep
-        #vals = ds_orig / len(years)
-        vals = ds_orig / 365 / 24 / 3600 / 1000000
-        
-        # Create new data 
-        ds_new = xr.DataArray(vals, coords = {'lat': lats, 'lon': lons},
-                                    dims   = ["lat", "lon"])  
-        # Add time step
-        ds_new = ds_new.assign_coords(time = years[tstep] )
-        ds_new = ds_new.expand_dims(dim = "time")
-        
-        # Add final data to the list over timesteps
-        list4month.append(ds_new)
-    
-    # Get new dataset with 0.5 resolution grid (Burned area)
-    pdep_mon = xr.concat(list4month, dim = 'time')
+    # Convert data from annual to monthly timestep. All monthly time steps
+    # are one broadcast view of the converted annual field (data are copied
+    # only at write time):
+    pdep_mon = expand_monthly(
+        ds_orig[var], 1850, factor = 1 / 365 / 24 / 3600 / 1000000)
     
     # Apply attribute settings: 
     pdep_mon.name = var
@@ -22,18 +22,6 @@ import lib4processing as l4p
 import lib4sys_support as l4s
 # =============================   Personal functions   =======================
 
-def get_param(
-    # Intup variables:
-    set4plot:dict,              # User settings for plots
-    **kwargs,                   # other parameters (pin, var, dims)
-    # Output variables:
-    ):
-    """Get data"""
-    ds, clon, clat = l4p.get_ICON_data(
-        kwargs['pin'], kwargs['var'], kwargs['dims'])
-    vis.plot_mask(
-        ds, clon, clat, set4plot, prefix = kwargs['prefix'])
-
 # ================   User settings (have to be adapted)  ===============
 # -- Parameters in NetCDF file:
 lst4param = [
@@ -47,8 +35,8 @@ pin1 = f'{l4s.input_path()}/bc_land_frac.nc'
 pin2 = f'{l4s.input_path()}/bc_land_frac_res.nc'
 pout = f'{l4s.output_path()}/res4bc_control'
 
-# -- Dimensions of data in NetCDF:
-dim4mask = 1
+# -- Dimensions of data in NetCDF (land/sea masks and other parameters are
+#    read together, so they have the same dimensions):
 dim4param = 1
 
 # -- Parameters in NetCDF responsible for land and sea:
@@ -99,36 +87,35 @@ if __name__ == '__main__':
     # -- Create output folder:
     pout = l4s.makefolder(pout)
 
-    # -- 1. Create land/sea and sea/land masks based on original and updated 
-    #       ICON boundary condition files:
-    # Get ICON data (for Land / Sea)
-    get_param(
-        set4mask_plots_ls, pin = pin1, var = var1, dims = dim4mask, prefix = f'{var1}_orig')
-    get_param(
-        set4mask_plots_ls, pin = pin2, var = var1, dims = dim4mask, prefix = f'{var1}_new')
-    # Get ICON data (for Sea / Land)
-    get_param(
-        set4mask_plots_sl, pin = pin1, var = var2, dims = dim4mask, prefix = f'{var2}_orig')
-    get_param(
-        set4mask_plots_sl, pin = pin2, var = var2, dims = dim4mask, prefix = f'{var2}_new')
+    # -- 1. Get land/sea masks and other data from original and updated ICON
+    #       boundary condition files. All parameters are read from each file
+    #       in one pass:
+    fields1, clon1, clat1 = l4p.get_ICON_fields(pin1, [var1, var2] + lst4param, dim4param)
+    fields2, clon2, clat2 = l4p.get_ICON_fields(pin2, [var1, var2] + lst4param, dim4param)
+    # -- Compare clat and clon values. We can do it only one time, because
+    #    parameters are common for all dataset variables:
+    check_lat = l4p.check_param(clat1, clat2, 'clat')
+    check_lon = l4p.check_param(clon1, clon2, 'clon')
 
-    # -- 2. Quality control and visualization of other data from NetCDF:
+    # -- 2. Maps of land/sea and sea/land masks:
+    jobs1 = [
+        dict(map = 'plot_mask', data = fields1[var1], set4plot = set4mask_plots_ls, prefix = f'{var1}_orig'),
+        dict(map = 'plot_mask', data = fields1[var2], set4plot = set4mask_plots_sl, prefix = f'{var2}_orig'),
+    ]
+    jobs2 = [
+        dict(map = 'plot_mask', data = fields2[var1], set4plot = set4mask_plots_ls, prefix = f'{var1}_new'),
+        dict(map = 'plot_mask', data = fields2[var2], set4plot = set4mask_plots_sl, prefix = f'{var2}_new'),
+    ]
+    # -- 3. Quality control and maps of other data from NetCDF:
     for var in lst4param:
         print('Working with ', var)
-        ds4param1, clon1, clat1 = l4p.get_ICON_data(pin1, var, dim4param)
-        ds4param2, clon2, clat2 = l4p.get_ICON_data(pin2, var, dim4param)
-        # -- Compare clat and clon values. We can do it only one time, because
-        #    parameters are common for all dataset variables:
-        if var == lst4param[0]:
-            # -- Check latitude values:
-            check_lat = l4p.check_param(clat1, clat2, 'clat')
-            # -- Check longitude values:
-            check_lon = l4p.check_param(clon1, clon2, 'clon')
+        ds4param1 = fields1[var]
+        ds4param2 = fields2[var]
         # -- Check main variables:
         check_var = l4p.check_param(ds4param1, ds4param2, var)
-        # -- Visualization of other data from NetCDF:
-        vis.icon_data(
-            ds4param1, clon1, clat1, set4plot, var = var, prefix = f'{var}_orig')
-        vis.icon_data(
-            ds4param2, clon2, clat2, set4plot, var = var, prefix = f'{var}_new')
+        jobs1.append(dict(data = ds4param1, set4plot = set4plot, var = var, prefix = f'{var}_orig'))
+        jobs2.append(dict(data = ds4param2, set4plot = set4plot, var = var, prefix = f'{var}_new'))
+    # -- Create all maps in a pool of processes (one pool for each grid):
+    vis.render_maps(jobs1, clon1, clat1)
+    vis.render_maps(jobs2, clon2, clat2)
 # ============================    End of program   =====================
@@ -23,14 +23,17 @@ import warnings
 warnings.filterwarnings("ignore")
 import lib4visualization as l4v
 import lib4sys_support as l4s
+import lib4processing as l4p
 # =============================   Personal functions   ================
 def get_co2(path):
-    """Get CO2 data from database file"""
+    """Get CO2 data from database file (parsed table is taken from the cache)"""
     # read data
-    df = pd.read_csv(path, header = None, sep = '\s+')
-    return (df.set_index((df[0] - 0.5)
-              .astype('int64'), drop = True)
-              .drop([0], axis = 1))
+    table = l4p.read_text_table(path)
+    return pd.DataFrame(
+        table[:, 1:],
+        index = pd.Index((table[:, 0] - 0.5).astype('int64'), name = 0),
+        columns = range(1, table.shape[1]),
+    )
 
 # ================   User settings (have to be adapted)  ==============
 # -- Input and output paths:
@@ -27,6 +27,7 @@ warnings.filterwarnings("ignore")
 # 1.2 Personal module
 import lib4sys_support as l4s
 import lib4visualization as l4v
+import lib4processing as l4p
 
 # =============================   Personal functions   ===================
 
@@ -34,10 +35,15 @@ import lib4visualization as l4v
 # Logical settings:
 lplot_ndep = True
 lplot_pdep = False
+lwrite_pdep = False      # Save P-deposition forcing for model (all cells) in NetCDF
 
 # -- Input and output paths:
 pin  = f'{l4s.input_path()}/DATA_NDEP_PDEP/R2B4_npdep_1850_2021_1p_annual.nc'
 fout = f'{l4s.output_path()}/check4ndep_pdep'
+pout_pdep = f'{fout}/pdep4model.nc'
+
+# -- Last year of pre-industrial P-deposition in model forcing:
+pdep_cutoff = 1900
 
 # User settings for time scale (x axis):
 yr1 = 1850
@@ -102,11 +108,16 @@ if __name__ == '__main__':
         lst4ds = [nc[var1][:,0], nc[var2][:,0]]
 
     if lplot_pdep is True:
-        # Create additional variable for p-dep plot (only)
-        var4model = np.zeros(len(nc[var1][:,0]))
-        for i in range(len(var4model)):
-            var4model[i] = nc['preindpdep'][:,0][i].data if nc[var1][:,0][i].time.dt.year <= 1900 else nc['pdep'][:,0][i].data
-        lst4ds = [nc[var1][:,0], nc[var2][:,0], var4model]
+        # Create P-deposition forcing for model (pre-industrial values until
+        # cutoff year, historical values after it) for all cells:
+        var4model = l4p.compose_forcing(
+            nc['preindpdep'],
+            nc['pdep'],
+            pdep_cutoff,
+            name = 'pdep4model',
+            pout = pout_pdep if lwrite_pdep else None,
+        )
+        lst4ds = [nc[var1][:,0], nc[var2][:,0], var4model[:,0]]
 
     # -- Create plots:
     l4v.get_line_plot(
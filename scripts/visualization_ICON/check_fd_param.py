@@ -16,6 +16,7 @@ Version    Date       Name
 """
 # =============================     Import modules     =================
 # 1.1: Standard modules
+import numpy as np
 import pandas as pd
 import xarray as xr
 import matplotlib.pyplot as plt
@@ -23,12 +24,17 @@ import warnings
 warnings.filterwarnings("ignore")
 
 import lib4sys_support as l4s
+import lib4processing as l4p
 # ============================  Personal functions  ======================
 def get_data(pin:str, param:str):
-    """ Get data from netcdf """
+    """ Get data from netcdf (rolling mean is calculated in time chunks) """
     global days
-    nc  = xr.open_dataset(pin)
-    return pd.DataFrame(nc[param][:,0,0].values).rolling(days).mean().dropna()
+    nc = l4p.open_ICON_dataset(pin)
+    data = nc[param][:,0,0]
+    ave = l4p.get_rolling_stats(data, [days], ('mean',))[('mean', days)]
+    # -- Index of window ends (as in pandas rolling):
+    return pd.DataFrame(
+        ave.values, index = np.arange(days - 1, data.shape[0])).dropna()
 
 
 # ====================   User settings (have to be adapted)   ==========
@@ -20,6 +20,7 @@ Version    Date       Name
 
 # =============================     Import modules     =================
 # 1.1: Standard modules
+import sys
 import numpy as np
 import pandas as pd
 import xarray as xr
@@ -33,6 +34,7 @@ import lib4processing as l4p
 def icon_vars(
     # Input variables:
     uset:dict,                           # User settings for plot
+    jobs:list[dict],                     # Map jobs (new job is added for research parameter)
     **kwargs,                            # Other parameters 
     # Output variables:
     ) -> tuple[
@@ -40,13 +42,13 @@ def icon_vars(
         np.array,                        # longitudes
         np.array,                        # Latittudes
     ]:
-    """Get ICON data for research parameter and create 2D map for it"""
+    """Get ICON data for research parameter and add 2D map for it to the jobs"""
     # -- Get data:
     ds, lon, lat = l4p.get_ICON_data(
         kwargs['pin'], kwargs['param'], kwargs['dims'])
-    # -- Create plot:
-    l4v.icon_data(ds, lon, lat, uset, var = kwargs['param'],
-        prefix = f"{kwargs['param']}_{kwargs['plt_name']}" )
+    # -- Add plot:
+    jobs.append(dict(data = ds, set4plot = uset, var = kwargs['param'],
+        prefix = f"{kwargs['param']}_{kwargs['plt_name']}"))
     return ds, lon, lat
 
 
@@ -65,12 +67,14 @@ def create_icon_map(
     plt_name2 = 'GSWP3_R2B4'
     
     lst4data = []
+    jobs = []
     #-- Get ICON data
     for param in parameters:
         # Get parameters for datasets:
         # Dataset 1:
         ds4param1, clon1, clat1 = icon_vars(
             set4plot.get(param),
+            jobs,
             pin = path1,
             param = param,
             dims = dims,
@@ -78,30 +82,38 @@ def create_icon_map(
         # Dataset 2:
         ds4param2, clon2, clat2 = icon_vars(
             set4plot.get(param),
+            jobs,
             pin = path2,
             param = param,
             dims = dims,
             plt_name = plt_name2)
+        # -- Difference and maps of both datasets need the same grid:
+        check_lat = l4p.check_param(clat1, clat2, 'clat')
+        check_lon = l4p.check_param(clon1, clon2, 'clon')
+        if check_lat is not None or check_lon is not None:
+            sys.exit(f'Datasets for {param} have different grids')
         # Find difference between das1 and ds2
         ds4param3 = ds4param1 - ds4param2
         lst4data.append(ds4param3)
 
-        # -- Create 2D map with difference:
+        # -- Add 2D map with difference:
         if param == 'assimi_gross_assimilation_box':
-            l4v.icon_data(
-                ds4param3, clon2, clat2,
-                set4plot.get('gpp_diff'),
+            jobs.append(dict(
+                data = ds4param3,
+                set4plot = set4plot.get('gpp_diff'),
                 var = 'gpp_diff',
                 prefix = 'gpp_diff_DIFF_CRUJRA-GSWP3',
-            )
+            ))
         else:
-            l4v.icon_data(
-                ds4param3, clon2, clat2, 
-                set4plot.get('lai_diff'),
+            jobs.append(dict(
+                data = ds4param3,
+                set4plot = set4plot.get('lai_diff'),
                 var = 'lai_diff',
                 prefix = 'pheno_lai_diff_DIFF_CRUJRA-GSWP3',
-            )
-            
+            ))
+    # -- Create all 2D maps in a pool of processes (grids of datasets were
+    #    checked, maps of both datasets use the common grid):
+    l4v.render_maps(jobs, clon2, clat2)
     return(lst4data)
 
 #================   User settings (have to be adapted)  =======================
@@ -30,14 +30,11 @@ warnings.filterwarnings("ignore")
 import lib4visualization as l4v
 import lib4sys_support as l4s
 import lib4processing as l4p
+import lib4grid as l4g
 
 # =============================     Personal functions     =============
 
 # =============================     User settings     ==================
-# -- Type of output figures (don't change):
-umode_linear ='lplot'
-umode_2dmaps = '2dmap'
-
 # -- Type of 2D maps (moment = mean --> mean over research period
 #                     moment = 5 ... -> get values for one year, where 5 is year index)
 moment = 5
@@ -212,62 +209,50 @@ if __name__ == '__main__':
         pin3 = f'{l4s.input_path()}/DATA_GSWP3_CRUJRA/QUINCY_CRUJRA_CO2/{param}_1985_1994.nc'
         datasets = [pin1, pin2, pin3]
 
-        # -- 2. Get data for linear plots:
-        lst4ds = []
+        # -- 2. Get data for linear plots (area weighted mean for LAI and sum
+        #       for other variables) and 2D maps. Each dataset is read once:
+        how = 'mean' if param == 'pheno_lai_box' else 'sum'
+        lst4line = []
+        lst4map = []
         for j in range(len(datasets)):
-            # -- Get data (We can use them for linear plots)
-            ds = gid.get_annual_ICON_data(
-                umode_linear,                       # type plot (lplot)
+            ds = gid.get_annual_ICON_products(
                 fluxes,                             # Research parameters presented as flux variable
                 param,                              # Research variable
+                how,                                # Type of global reduction
                 dpath = datasets[j],                # Input dataset path
                 apath = pin_area,                   # Input dataset path with cell area variable
-                t1 = yr1,                           # First year of the research period 
+                t1 = yr1,                           # First year of the research period
                 t2 = yr2,                           # Last year of the research period
                 tstep = tstep,                      # Time frequency
             )
-            # -- Prep data for linear plots:
-            if param == 'assimi_gross_assimilation_box':
-                ds_corr = list(map(lambda x: x.sum(dim = {'ncells'}), ds))
-            elif param == 'veg_veg_pool_total_c_box':
-                ds_corr = list(map(lambda x: x.sum(dim = {'ncells'}), ds))
-            else:
-                ds_corr = list(map(lambda x: x.mean(dim = {'ncells'}), ds))
-            # -- Add prepared dataset to list:
-            lst4ds.append(ds_corr)
+            lst4line.append(ds['lplot'])
+            lst4map.append(ds['2dmap'])
 
         # -- Create linear plot:
         l4v.get_line_plot(
             'DataArray',
             set4line_plot.get(param),
-            data_xr = lst4ds,
-            years = years, 
+            data_xr = lst4line,
+            years = years,
         )
 
-        # -- 3. Get data for 2D Maps:
+        # -- 3. Create 2D maps:
         lst4ds = []
         for j in range(len(datasets)):
-            # -- Get data (We can use them for linear plots)
-            ds = gid.get_annual_ICON_data(
-                    umode_2dmaps,                       # type plot (lplot)
-                    fluxes,                             # Research parameters presented as flux variable
-                    param,                              # Research variable
-                    dpath = datasets[j],                # Input dataset path
-                    t1 = yr1,                           # First year of the research period 
-                    t2 = yr2,                           # Last year of the research period
-                    tstep = tstep,                      # Time frequency
-                )
+            ds = lst4map[j]
             # -- Get mean data over time axis (nc_crujra has annual values):
             if moment == 'mean':
                 ds_corr = ds.mean(dim = {'time'})
             else:
                 ds_corr = ds[moment]
             lst4ds.append(ds_corr)
+            # -- Get coordinates in degree from the grid registry:
+            clon, clat = l4g.get_grid_coords(ds)
             # -- Create 2D maps for parameter:
             l4v.icon_data(
                 ds_corr.values,
-                np.rad2deg(ds_corr.clon.values),
-                np.rad2deg(ds_corr.clat.values),
+                clon,
+                clat,
                 set4plot_2dmap.get(param),
                 var = param,
                 prefix = f'{labels[j]}_{moment}'
@@ -283,8 +268,8 @@ if __name__ == '__main__':
                 # -- Create 2D maps for difference:
                 l4v.icon_data(
                     diff.values,
-                    np.rad2deg(diff.clon.values),
-                    np.rad2deg(diff.clat.values),
+                    clon,
+                    clat,
                     set4plot_2dmap.get(diff_param),
                     var = diff_param,
                     prefix = f'{labels[i]}_{moment}_{diff_param}'
@@ -34,9 +34,6 @@ import lib4processing as l4p
 # =============================   Personal functions   =================
 
 # ================   User settings (have to be adapted)  ===============
-# -- Type of output figures (don't change):
-umode = 'lplot'
-
 # -- Variables for analysis:
 var_set4line = [
     'pheno_lai_box', 
@@ -163,21 +160,19 @@ if __name__ == '__main__':
     gid = l4p.Get_ICON_QUINCY_data()
     # -- Get data (We can use them for linear plots):
     for i in range(len(lst4path)):
-        ds = gid.get_annual_ICON_data(
-            umode,                              # type plot (lplot)
+        # -- Global values: area weighted mean for LAI and sum for other variables
+        how = 'mean' if var_set4line[i] == 'pheno_lai_box' else 'sum'
+        amean = gid.get_global_ICON_data(
             fluxes,                             # Research parameters presented as flux variable
             var_set4line[i],                    # Research variable
+            how,                                # Type of global reduction
             dpath = lst4path[i],                # Input dataset path
             apath = pin_area,                   # Input dataset path with cell area variable
             t1 = start_year,                    # First year of the research period
             t2 = end_year,                      # Last year of the research period
             tstep = tstep,                      # Time frequency
+            lcache = True,                      # Use results from the on-disk cache
         )
-        # -- Prep data for linear plots:
-        if var_set4line[i] == 'pheno_lai_box':
-            amean = ds.mean(dim = {'ncells'})
-        else:
-            amean = ds.sum(dim = {'ncells'})
         # -- Create linear plot:
         l4v.get_line_plot(
             'DataArray',
@@ -31,6 +31,7 @@ sys.path.append(os.path.join(os.getcwd(), '..'))
 import lib4visualization as l4v
 import lib4sys_support as l4s
 import lib4processing as l4p
+import lib4grid as l4g
 # =============================   Personal functions   =================
 
 # ================   User settings (have to be adapted)  ===============
@@ -139,7 +140,8 @@ if __name__ == '__main__':
     output_folder = l4s.makefolder(fout)
     # -- Activate class for work with ICON - QUINCy data:
     gid = l4p.Get_ICON_QUINCY_data()
-    # -- Get data (We can use them for 2D maps):
+    # -- Get data (We can use them for 2D maps). Maps are collected for each grid:
+    grids = {}
     for i in range(len(lst4path)):
         ds = gid.get_annual_ICON_data(
             umode,                              # type plot (2D map)
@@ -149,15 +151,19 @@ if __name__ == '__main__':
             t1 = start_year,                    # First year of the research period
             t2 = end_year,                      # Last year of the research period
             tstep = tstep,                      # Time frequency
+            lcache = True,                      # Use results from the on-disk cache
         )
         # -- Get mean data over time axis (nc_crujra has annual values):
         ave_data = ds.mean(dim = {'time'})
-        # -- Create 2d plot:
-        l4v.icon_data(
-            ave_data.values,
-            np.rad2deg(ave_data.clon.values),
-            np.rad2deg(ave_data.clat.values),
-            set4plot_2dmap.get(var_set4line[i]),
+        # -- Get coordinates in degree from the grid registry:
+        clon, clat = l4g.get_grid_coords(ds)
+        jobs = grids.setdefault(l4g.get_grid_id(ds), (clon, clat, []))[2]
+        jobs.append(dict(
+            data = ave_data.values,
+            set4plot = set4plot_2dmap.get(var_set4line[i]),
             var = var_set4line[i],
             prefix = f'{var_set4line[i]}_{start_year}_{end_year}',
-        )
+        ))
+    # -- Create 2d plots in a pool of processes:
+    for clon, clat, jobs in grids.values():
+        l4v.render_maps(jobs, clon, clat)
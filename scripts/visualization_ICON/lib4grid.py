@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Description: Module with ICON grid registry. Grid is identified by the
+             uuidOfHGrid attribute or by hash of clon/clat values. Grid
+             products (coordinates in degree, boundaries, etc.) are computed
+             once and saved as memory-mappable .npy files.
+
+Authors: Evgenii Churiulin
+
+Current Code Owner: MPI-BGC, Evgenii Churiulin
+phone:  +49  170 261-5104
+email:  evgenychur@bgc-jena.mpg.de
+
+History:
+Version    Date       Name
+---------- ---------- ----
+    1.1    17.10.2026 Evgenii Churiulin, MPI-BGC
+           Initial release
+"""
+# =============================     Import modules     ======================
+import os
+import hashlib
+import numpy as np
+import xarray as xr
+from typing import Callable, Union
+
+import lib4sys_support as l4s
+# =============================   Global variables   ===================
+GRID_ATTR = 'uuidOfHGrid'            # ICON attribute with grid identifier
+_grid_ids = {}                       # (source, mtime) --> grid identifier
+_products = {}                       # (grid identifier, product) --> np.array
+_same_grids = set()                  # Pairs of grid identifiers with the same coordinates
+
+# =============================   Personal functions   =================
+def coords_id(
+    # Input parameters:
+    clon:np.array,                   # Longitudes
+    clat:np.array,                   # Latitudes
+    # Output parameters:
+    ) -> str:                        # Grid identifier
+    """ Get grid identifier based on hash of clon and clat values """
+    hsum = hashlib.sha1()
+    for coord in (clon, clat):
+        coord = np.ascontiguousarray(coord)
+        hsum.update(str(coord.dtype).encode())
+        hsum.update(coord.tobytes())
+    return hsum.hexdigest()
+
+
+def get_grid_id(
+    # Input parameters:
+    ds:Union[xr.Dataset, xr.DataArray], # ICON data with clon and clat coordinates
+    # Output parameters:
+    ) -> str:                           # Grid identifier
+    """ Get ICON grid identifier (uuidOfHGrid attribute or hash of clon/clat) """
+    if GRID_ATTR in ds.attrs:
+        return str(ds.attrs[GRID_ATTR])
+    # -- Hash for the file was already calculated:
+    source = ds.encoding.get('source')
+    if source is not None and os.path.exists(source):
+        key = (source, os.stat(source).st_mtime_ns)
+        if key not in _grid_ids:
+            _grid_ids[key] = coords_id(ds.clon.values, ds.clat.values)
+        return _grid_ids[key]
+    return coords_id(ds.clon.values, ds.clat.values)
+
+
+def check_same_grid(
+    # Input parameters:
+    ds1:Union[xr.Dataset, xr.DataArray], # First ICON dataset
+    ds2:Union[xr.Dataset, xr.DataArray], # Second ICON dataset
+    # Output parameters:
+    ) -> bool:                           # Datasets have the same grid
+    """ Check, if two datasets have the same grid. Coordinates are compared
+        only for the first pair of grid identifiers """
+    gid1 = get_grid_id(ds1)
+    gid2 = get_grid_id(ds2)
+    if gid1 == gid2 or (gid1, gid2) in _same_grids:
+        return True
+    # -- Full comparison of coordinates (first encounter of grid pair):
+    lsame = (
+        np.array_equal(ds1.clon.values, ds2.clon.values) and
+        np.array_equal(ds1.clat.values, ds2.clat.values)
+    )
+    if lsame:
+        _same_grids.update({(gid1, gid2), (gid2, gid1)})
+    return lsame
+
+
+def get_grid_product(
+    # Input parameters:
+    gid:str,                         # Grid identifier
+    name:str,                        # Name of grid product
+    builder:Callable[[], np.array],  # Function for calculation of grid product
+    # Output parameters:
+    ) -> np.array:                   # Grid product (memory-mapped array)
+    """ Get grid product from the registry (calculate and save it only once) """
+    key = (gid, name)
+    if key in _products:
+        return _products[key]
+    fname = f"{gid}_{name}".replace(os.sep, '_')
+    pout = f"{l4s.cache_path('grids')}{fname}.npy"
+    if not os.path.exists(pout):
+        # -- Write to temporary file first, so other runs never read half-written products:
+        ptmp = f"{pout[:-4]}_{os.getpid()}.tmp.npy"
+        np.save(ptmp, np.asarray(builder()))
+        os.replace(ptmp, pout)
+    _products[key] = np.load(pout, mmap_mode = 'r')
+    return _products[key]
+
+
+def get_grid_coords(
+    # Input parameters:
+    ds:Union[xr.Dataset, xr.DataArray], # ICON data with clon and clat coordinates
+    # Output parameters:
+    ) -> tuple[
+        np.array,                       # Longitudes (in degree)
+        np.array,                       # Latitudes (in degree)
+    ]:
+    """ Get ICON cell centre coordinates in degree """
+    gid = get_grid_id(ds)
+    clon = get_grid_product(gid, 'clon', lambda: np.rad2deg(ds.clon.values))
+    clat = get_grid_product(gid, 'clat', lambda: np.rad2deg(ds.clat.values))
+    return clon, clat
+
+
+def get_grid_bnds(
+    # Input parameters:
+    ds:xr.Dataset,                   # ICON data with clon_bnds and clat_bnds
+    # Output parameters:
+    ) -> tuple[
+        np.array,                    # Longitude boundaries (in degree)
+        np.array,                    # Latitude boundaries (in degree)
+    ]:
+    """ Get ICON cell vertices in degree """
+    gid = get_grid_id(ds)
+    clon_bnds = get_grid_product(gid, 'clon_bnds', lambda: np.rad2deg(ds.clon_bnds.values))
+    clat_bnds = get_grid_product(gid, 'clat_bnds', lambda: np.rad2deg(ds.clat_bnds.values))
+    return clon_bnds, clat_bnds
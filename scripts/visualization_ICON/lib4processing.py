@@ -15,7 +15,12 @@ Version    Date       Name
            Initial release
 """
 # =============================     Import modules     ======================
+import os
 import sys
+import glob
+import hashlib
+from typing import Union
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
 import xarray as xr
@@ -23,7 +28,49 @@ import warnings
 warnings.filterwarnings("ignore")
 
 import lib4unit_conversion as l4cnv
+import lib4grid as l4g
+import lib4sys_support as l4s
+import lib4profiling as l4pr
+# =============================   Global variables   ===================
+NC_CACHE_SIZE = 8                    # Max number of simultaneously open NetCDF files
+_nc_cache = OrderedDict()            # Open NetCDF files: key --> (mtime, dataset)
+RESULT_CACHE_SIZE = 2 * 1024**3      # Max size of cached annual results (bytes)
+
 # =============================   Personal functions   =================
+def open_ICON_dataset(
+    # Input parameters:
+    pin:str,                         # Input path
+    **kwargs,                        # Other parameters for xr.open_dataset (chunks, decode_times)
+    # Output parameters:
+    ) -> xr.Dataset:                 # Open NetCDF file (shared between readers)
+    """ Get NetCDF file from the process-wide cache of open files """
+    key = (os.path.abspath(pin), repr(sorted(kwargs.items())))
+    mtime = os.stat(pin).st_mtime_ns
+    # -- File was already opened and wasn't changed after that:
+    if key in _nc_cache:
+        cached_mtime, nc = _nc_cache.pop(key)
+        if cached_mtime == mtime:
+            _nc_cache[key] = (cached_mtime, nc)
+            return nc
+        nc.close()
+    # -- Open file. Loaded values aren't kept in the dataset (cache = False),
+    #    so cached files don't hold data in memory:
+    nc = xr.open_dataset(pin, cache = False, **kwargs)
+    _nc_cache[key] = (mtime, nc)
+    # -- Close the least recently used files:
+    while len(_nc_cache) > NC_CACHE_SIZE:
+        _, (_, old_nc) = _nc_cache.popitem(last = False)
+        old_nc.close()
+    return nc
+
+
+def close_ICON_datasets():
+    """ Close all NetCDF files in the cache of open files """
+    while _nc_cache:
+        _, (_, nc) = _nc_cache.popitem()
+        nc.close()
+
+
 def get_ICON_data(
     # Input parameters:
     pin:str,                         # Input path
@@ -33,6 +80,11 @@ def get_ICON_data(
                                      # dim = 2  --> parameter has 2 dimensions (in case of ICON - time, cell)
                                      # dim = 20 --> parameter has 2 dimensions (time, cell), but you want
                                      # to get data from 0 moment of time
+    **kwargs,                        # Other parameters (optional):
+                                     # lazy   --> read data with dask chunks (True or False)
+                                     # chunks --> dask chunks for lazy mode (e.g. {'time': 12})
+                                     # tsel   --> time index (int) or time range (slice)
+                                     # csel   --> cell indices (np.array) or cell range (slice)
     # Output parameters
     ) -> tuple[
         np.array,                    # Array with research parameter
@@ -40,26 +92,106 @@ def get_ICON_data(
         np.array,                    # Array with Latitudes (in degree)
     ]:
     """ Get ICON data """
+    # -- Open NetCDf (in lazy mode data are presented as dask chunks):
+    if kwargs.get('lazy'):
+        nc = open_ICON_dataset(pin, chunks = kwargs.get('chunks', {}))
+    else:
+        nc = open_ICON_dataset(pin)
+    # -- Get variable (only selected time steps and cells are read from file):
+    tsel = kwargs.get('tsel')
+    csel = kwargs.get('csel')
+    with l4pr.stage('read'):
+        var = l4s.as_float_type(select_ICON_data(nc[param], dim, tsel = tsel, csel = csel).values)
+    # -- Use additional data corrections:
+    if param in ('tmin', 'tmax'):
+        var = var - 273.15
+    # -- Get coordinates in degrees (from the grid registry):
+    clon, clat = l4g.get_grid_coords(nc)
+    if csel is not None and dim != 3:
+        clon = clon[csel]
+        clat = clat[csel]
+    return var, clon, clat
+
+
+def get_ICON_fields(
+    # Input parameters:
+    pin:str,                         # Input path
+    params:list[str],                # Research parameters (with the same dimensions)
+    dim:int,                         # Dimension of data (see get_ICON_data)
+    **kwargs,                        # Other parameters (optional):
+                                     # lstack --> return stacked array (params, ...) instead of dict
+                                     # lazy, chunks, tsel, csel (see get_ICON_data)
+    # Output parameters
+    ) -> tuple[
+        Union[dict, np.array],       # Research parameters {param: np.array} or stacked np.array (lstack)
+        np.array,                    # Array with Longitudes (in degree)
+        np.array,                    # Array with Latitudes (in degree)
+    ]:
+    """ Get several ICON parameters from one file in one pass (as dict or
+        as one array stacked along the first axis in order of params) """
     # -- Open NetCDf:
-    nc  = xr.open_dataset(pin)
-    # -- Get variable:
+    if kwargs.get('lazy'):
+        nc = open_ICON_dataset(pin, chunks = kwargs.get('chunks', {}))
+    else:
+        nc = open_ICON_dataset(pin)
+    # -- Read all selected parameters together:
+    tsel = kwargs.get('tsel')
+    csel = kwargs.get('csel')
+    indexers = get_ICON_indexers(nc[params[0]].dims, dim, tsel = tsel, csel = csel)
+    with l4pr.stage('read'):
+        ds = nc[list(params)].isel(indexers).load()
+    fields = {}
+    for param in params:
+        fields[param] = l4s.as_float_type(ds[param].values)
+        # -- Use additional data corrections:
+        if param in ('tmin', 'tmax'):
+            fields[param] = fields[param] - 273.15
+    if kwargs.get('lstack'):
+        fields = np.stack([fields[param] for param in params])
+    # -- Get coordinates in degrees (common for all parameters):
+    clon, clat = l4g.get_grid_coords(nc)
+    if csel is not None and dim != 3:
+        clon = clon[csel]
+        clat = clat[csel]
+    return fields, clon, clat
+
+
+def get_ICON_indexers(
+    # Input parameters:
+    dims:tuple[str],                 # Dimensions of research parameter
+    dim:int,                         # Dimension of data (see get_ICON_data)
+    tsel = None,                     # Time index (int) or time range (slice)
+    csel = None,                     # Cell indices (np.array) or cell range (slice)
+    # Output parameters:
+    ) -> dict:                       # Indexers for isel
+    """ Get indexers for selection of ICON data """
+    # -- Default values: all time steps (dim = 20 --> first time step) and all cells
+    if tsel is None:
+        tsel = 0 if dim == 20 else slice(None)
+    csel = slice(None) if csel is None else csel
     if dim == 1:
-        var = nc[param][:].values
+        indexers = {dims[0]: csel}
     elif dim == 2:
-        var = nc[param][:,:].values
+        indexers = {dims[0]: tsel, dims[1]: csel}
     elif dim == 3:
-        var = nc[param][:,0,0].values
+        indexers = {dims[0]: tsel, dims[1]: 0, dims[2]: 0}
     elif dim == 20:
-        var = nc[param][0,:].values
+        indexers = {dims[0]: tsel, dims[1]: csel}
     else:
         sys.exit('Dimension format for ICON data is incorrect')
-    # -- Use additional data corrections:
-    if param in ('tmin', 'tmax'):
-        var = var - 273.15
-    # -- Get coordinates and convert radians to degrees
-    clon = np.rad2deg(nc.clon.values)
-    clat = np.rad2deg(nc.clat.values)
-    return var, clon, clat
+    return indexers
+
+
+def select_ICON_data(
+    # Input parameters:
+    data:xr.DataArray,               # Research parameter (not loaded)
+    dim:int,                         # Dimension of data (see get_ICON_data)
+    tsel = None,                     # Time index (int) or time range (slice)
+    csel = None,                     # Cell indices (np.array) or cell range (slice)
+    # Output parameters:
+    ) -> xr.DataArray:               # Selection of the research parameter
+    """ Get selection of ICON data without reading of the full variable """
+    return data.isel(get_ICON_indexers(data.dims, dim, tsel = tsel, csel = csel))
 
 
 def get_ICON_bnds(
@@ -71,107 +203,698 @@ def get_ICON_bnds(
         xr.DataArray,                # Latitude boundaries.
     ]:
     """ Get ICON bnds values for longitude and latitude """
-    nc  = xr.open_dataset(pin)
+    nc  = open_ICON_dataset(pin)
     return nc.clon_bnds, nc.clat_bnds
 
 
+def _as_signed(values:np.array) -> np.array:
+    """Get values with signed type for differences (unsigned integers
+       and booleans are converted to float64, subtraction doesn't wrap)"""
+    return values if values.dtype.kind in 'fc' else values.astype(np.float64)
+
+
+def compare_fields(
+    # Input variables:
+    var1 : np.array,                 # First dataset (1D - cell or 2D - time, cell)
+    var2 : np.array,                 # Second dataset
+    atol : float = 0.0,              # Absolute tolerance
+    rtol : float = 0.0,              # Relative tolerance (relative to var2)
+    chunk_size : int = 2**22,        # Number of values compared at once
+    # Output variables:
+    ) -> dict:                       # Indices of different values and summary counts
+    """ Vectorized comparison of two fields (NaN values are treated as equal) """
+    arr1 = np.asarray(var1)
+    arr2 = np.asarray(var2)
+    if arr1.shape != arr2.shape:
+        sys.exit(f'Datasets have different shapes: {arr1.shape} and {arr2.shape}')
+    # -- Flat views of data (for memmap arrays only actual chunk is read):
+    flat1 = arr1.reshape(-1)
+    flat2 = arr2.reshape(-1)
+    lnan = arr1.dtype.kind in 'fc' or arr2.dtype.kind in 'fc'
+    lst4index = []
+    nnan = 0
+    max_diff = 0.0
+    for i0 in range(0, flat1.size, chunk_size):
+        chunk1 = flat1[i0:i0 + chunk_size]
+        chunk2 = flat2[i0:i0 + chunk_size]
+        # -- Find different values:
+        if atol == 0.0 and rtol == 0.0:
+            ldiff = chunk1 != chunk2
+        else:
+            diff = np.abs(_as_signed(chunk1) - _as_signed(chunk2))
+            ldiff = diff > atol + rtol * np.abs(_as_signed(chunk2))
+        # -- NaN values in both datasets are equal, NaN and number are different
+        #    (comparison with tolerance is False for NaN values):
+        if lnan:
+            lnan1 = np.isnan(chunk1)
+            lnan2 = np.isnan(chunk2)
+            lnan_both = lnan1 & lnan2
+            ldiff = (ldiff | (lnan1 ^ lnan2)) & ~lnan_both
+            nnan += int(np.count_nonzero(lnan_both))
+        index = np.flatnonzero(ldiff)
+        if index.size > 0:
+            lst4index.append(index + i0)
+            if arr1.dtype.kind in 'biufc' and arr2.dtype.kind in 'biufc':
+                diff = np.abs(_as_signed(chunk1[index]) - _as_signed(chunk2[index]))
+                diff = diff[~np.isnan(diff)]
+                if diff.size > 0:
+                    max_diff = max(max_diff, float(diff.max()))
+    # -- Indices of different values (np.nonzero style for 2D data):
+    index = np.concatenate(lst4index) if lst4index else np.array([], dtype = np.intp)
+    ndiff = index.size
+    if arr1.ndim > 1:
+        index = np.unravel_index(index, arr1.shape)
+    return {
+        'index' : index,             # Indices of different values
+        'count' : ndiff,             # Number of different values
+        'size'  : flat1.size,        # Number of compared values
+        'nan_equal' : nnan,          # Number of NaN values presented in both datasets
+        'max_diff' : max_diff,       # Maximal absolute difference
+    }
+
+
 def check_param(
     # Input variables:
     var1 : xr.DataArray,             # First dataset
     var2 : xr.DataArray,             # Second dataset
     pname : str,                     # Research parameter
+    **kwargs,                        # Other parameters (atol, rtol, chunk_size)
     # Output variables:
-    ) -> list[int]:                  # In case of different values all
+    ) -> np.array:                   # In case of different values all
                                      # problematic indexis will be presented
-                                     # in this data list
+                                     # in this array (tuple of arrays for 2D data)
     """ Quality control of the research data"""
-    prb_list = []
-    if len(var1) == len(var2):
-        for i in range(len(var1)):
-            if pname not in ('clat', 'clon'):
-                if var1[i] != var2[i]:
-                    prb_list.append(i)
-            else:
-                if var1[i] != var2[i]:
-                    prb_list.append(i)
-    if len(prb_list) == 0:
+    res = compare_fields(var1, var2, **kwargs)
+    if res['count'] == 0:
         print(f'{pname} values in datasets are the same! \n')
     else:
-        return prb_list
-        sys.exit(f'{pname} data in files are different')
+        print(f"{pname} data in files are different: {res['count']} of {res['size']} values "
+              f"(max difference - {res['max_diff']}) \n")
+        return res['index']
+
+
+@l4pr.profile('resample')
+def get_annual_values(
+    # Input variables:
+    data:xr.DataArray,               # Research parameter with time axis
+    how:str,                         # Type of aggregation (sum or mean)
+    time_axis:str = 'time',          # Name of time axis
+    lweight:bool = False,            # Use days in month as weights for mean values
+    dtype:type = None,               # Float type of values (default: float_type(), float32 in
+                                     # reduced precision mode; float64 - for global values)
+    # Output variables:
+    ) -> xr.DataArray:               # Annual values of the research parameter
+    """Get annual values. Regular monthly, daily and annual time axes are
+       aggregated by reshape (or reduceat), other time axes by resample"""
+    # -- Local variables:
+    time_step = 'A'                  # step for resample (A - annual)
+    time = pd.DatetimeIndex(data[time_axis].values)
+    years, first, counts = np.unique(time.year, return_index = True, return_counts = True)
+    # -- Time axis is regular, if it's sorted and has all years without gaps:
+    lregular = (np.all(np.diff(time.asi8) > 0) and np.all(np.diff(years) == 1))
+    # -- Weights (days in month) are used only for mean values:
+    lweight = lweight and how == 'mean'
+    weights = time.days_in_month.values.astype(l4s.float_type()) if lweight else None
+
+    # -- Irregular time axis: use generic resample
+    if not lregular:
+        if how == 'sum':
+            return data.resample({time_axis: time_step}).sum(time_axis)
+        if lweight:
+            wdata = xr.DataArray(weights, dims = time_axis, coords = {time_axis: data[time_axis]})
+            wdata = wdata.where(data.notnull())
+            return (
+                (data * wdata).resample({time_axis: time_step}).sum(time_axis) /
+                wdata.resample({time_axis: time_step}).sum(time_axis)
+            )
+        return data.resample({time_axis: time_step}).mean(time_axis)
+
+    # -- Regular time axis: time steps of each year are one block of data
+    values = data.transpose(time_axis, ...).values
+    values = l4s.as_float_type(values) if dtype is None else values.astype(dtype, copy = False)
+    lvalid = ~np.isnan(values)
+    values = np.where(lvalid, values, 0.0)
+    if lweight:
+        wshape = (-1,) + (1,) * (values.ndim - 1)
+        values = values * weights.reshape(wshape)
+        lvalid = lvalid * weights.reshape(wshape)
+    if np.all(counts == counts[0]):
+        # Same number of time steps in each year (monthly, annual, 365-day calendar):
+        shape = (years.size, counts[0]) + values.shape[1:]
+        asum = values.reshape(shape).sum(axis = 1)
+        if how == 'mean':
+            nvalid = lvalid.reshape(shape).sum(axis = 1)
+    else:
+        # Different number of time steps (daily data with leap years):
+        asum = np.add.reduceat(values, first, axis = 0)
+        if how == 'mean':
+            nvalid = np.add.reduceat(lvalid, first, axis = 0)
+    if how == 'mean':
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            asum = (asum / nvalid).astype(asum.dtype, copy = False)
+    # -- Create output DataArray (labels are the same as in resample - end of year):
+    coords = {
+        name: coord for name, coord in data.coords.items() if time_axis not in coord.dims}
+    coords[time_axis] = pd.to_datetime([f'{year}-12-31' for year in years])
+    ds_new = xr.DataArray(
+        asum,
+        dims = (time_axis,) + tuple(dim for dim in data.dims if dim != time_axis),
+        coords = coords,
+        name = data.name,
+    )
+    return ds_new.transpose(*data.dims)
+
+
+def get_cache_key(
+    # Input variables:
+    **kwargs,                        # Parameters of cached result
+    # Output variables:
+    ) -> str:                        # Key of cached result
+    """Get key of cached result. Input files are presented by path, time of
+       modification and size, arrays - by hash of their values"""
+    parts = []
+    for name, value in sorted(kwargs.items()):
+        if isinstance(value, str) and os.path.isfile(value):
+            stat = os.stat(value)
+            value = (os.path.abspath(value), stat.st_mtime_ns, stat.st_size)
+        elif isinstance(value, (np.ndarray, xr.DataArray)):
+            value = hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest()
+        parts.append(f'{name}={value!r}')
+    return hashlib.sha1(';'.join(parts).encode()).hexdigest()
+
+
+@l4pr.profile('read_cache')
+def read_cached_result(
+    # Input variables:
+    key:str,                         # Key of cached result
+    # Output variables:
+    ):                               # Cached result (xr.DataArray or dict) or None
+    """Read result from the cache of annual ICON data"""
+    pin = f"{l4s.cache_path('results')}{key}.nc"
+    if not os.path.exists(pin):
+        return None
+    # -- Update time of the last usage (for eviction of old results):
+    os.utime(pin)
+    with xr.open_dataset(pin) as nc:
+        nc = nc.load()
+    res = {}
+    for name in nc.data_vars:
+        res[nc[name].attrs.pop('product')] = nc[name].rename(nc[name].attrs.pop('name'))
+    return res if nc.attrs.get('ldict') else res['result']
+
+
+def write_cached_result(
+    # Input variables:
+    key:str,                         # Key of cached result
+    result,                          # Result (xr.DataArray or dict with xr.DataArray)
+    ):
+    """Write result to the cache of annual ICON data (compressed NetCDF)"""
+    products = result if isinstance(result, dict) else {'result': result}
+    ds = xr.Dataset()
+    for i, (product, data) in enumerate(products.items()):
+        data = data.copy()
+        data.attrs.update({'product': product, 'name': str(data.name)})
+        ds[f'res{i}'] = data
+    ds.attrs['ldict'] = int(isinstance(result, dict))
+    # -- Write to temporary file first, so other runs never read half-written results:
+    pout = f"{l4s.cache_path('results')}{key}.nc"
+    ptmp = f"{pout[:-3]}_{os.getpid()}.tmp"
+    ds.to_netcdf(
+        ptmp, encoding = {name: {'zlib': True, 'complevel': 4} for name in ds.data_vars})
+    os.replace(ptmp, pout)
+    clean_result_cache(RESULT_CACHE_SIZE)
+
+
+def clean_result_cache(
+    # Input variables:
+    max_size:int,                    # Max size of cached results (bytes)
+    ):
+    """Remove the least recently used results from the cache of annual ICON data"""
+    files = sorted(
+        glob.glob(f"{l4s.cache_path('results')}*.nc"), key = os.path.getmtime)
+    total = sum(os.path.getsize(file) for file in files)
+    for file in files[:-1]:
+        if total <= max_size:
+            break
+        total -= os.path.getsize(file)
+        os.remove(file)
+
+
+def read_text_table(
+    # Input variables:
+    pin:str,                         # Path to the text file (whitespace separated numbers)
+    # Output variables:
+    ) -> np.array:                   # Table (rows, columns) - memory-mapped array
+    """Read numeric text table (e.g. CO2 forcing: input4MIPs delta13C and
+       Delta14C files, GCP_co2_global.dat). Parsed table is saved in the cache
+       as .npy file, text is parsed again only if the file was changed"""
+    stat = os.stat(pin)
+    name = hashlib.sha1(os.path.abspath(pin).encode()).hexdigest()
+    pcache = f"{l4s.cache_path('tables')}{name}_{stat.st_mtime_ns}_{stat.st_size}.npy"
+    if not os.path.exists(pcache):
+        with open(pin, 'rb') as ftxt:
+            raw = ftxt.read()
+        ncols = len(raw.lstrip().split(b'\n', 1)[0].split())
+        values = np.array(raw.split(), dtype = np.float64)
+        if ncols == 0 or values.size % ncols != 0:
+            sys.exit(f'Table in {pin} has different number of values in rows')
+        # -- Remove tables of previous versions of the file:
+        for old in glob.glob(f"{l4s.cache_path('tables')}{name}_*.npy"):
+            if not old.endswith('.tmp.npy'):
+                os.remove(old)
+        ptmp = f"{pcache[:-4]}_{os.getpid()}.tmp.npy"
+        np.save(ptmp, values.reshape(-1, ncols))
+        os.replace(ptmp, pcache)
+    return np.load(pcache, mmap_mode = 'r')
+
+
+def compose_forcing(
+    # Input variables:
+    before:xr.DataArray,             # Forcing used up to the cutoff year (e.g. preindpdep)
+    after:xr.DataArray,              # Forcing used after the cutoff year (e.g. pdep)
+    cutoff:int,                      # Last year of the first forcing
+    time_axis:str = 'time',          # Name of time axis
+    name:str = None,                 # Name of composed forcing (default: name of the second forcing)
+    pout:str = None,                 # Output path (optional): composed forcing is saved in NetCDF
+    # Output variables:
+    ) -> xr.DataArray:               # Composed forcing (time, ...) for all cells
+    """Compose model forcing from two datasets (e.g. pre-industrial and
+       historical deposition) by one vectorized selection over the full field"""
+    composed = xr.where(after[time_axis].dt.year <= cutoff, before, after)
+    composed = composed.transpose(*after.dims).rename(name or after.name)
+    composed.attrs = dict(after.attrs)
+    composed.attrs['history'] = f'{before.name} until {cutoff}, {after.name} after {cutoff}'
+    if pout is not None:
+        composed.to_netcdf(pout, encoding = {composed.name: {'zlib': True, 'complevel': 4}})
+    return composed
+
+
+def rolling_extreme(
+    # Input variables:
+    values:np.array,                 # Data with time axis as the first axis
+    window:int,                      # Window length (number of time steps)
+    func:np.ufunc,                   # np.maximum or np.minimum
+    # Output variables:
+    ) -> np.array:                   # Rolling max/min of full windows (len(values) - window + 1, ...)
+    """Get rolling max or min by van Herk / Gil-Werman algorithm (3
+       comparisons per value independent of the window length)"""
+    ntime = values.shape[0]
+    nblock = -(-ntime // window)
+    # -- Data are padded to full blocks by the neutral value of func:
+    fill = -np.inf if func is np.maximum else np.inf
+    pad = np.full((nblock * window - ntime,) + values.shape[1:], fill, dtype = values.dtype)
+    blocks = np.concatenate([values, pad]).reshape((nblock, window) + values.shape[1:])
+    # -- Running extremes from the start (g) and from the end (h) of each block:
+    g = func.accumulate(blocks, axis = 1).reshape((-1,) + values.shape[1:])
+    h = func.accumulate(blocks[:, ::-1], axis = 1)[:, ::-1].reshape((-1,) + values.shape[1:])
+    nout = ntime - window + 1
+    return func(h[:nout], g[window - 1:window - 1 + nout])
+
+
+class Rolling_stats:
+    """Streaming rolling statistics over time axis (first axis of data).
+       Data are added in time chunks, the last time steps of previous chunk
+       are carried to the next one, so each chunk gives values of all full
+       windows ending in it. Windows with NaN values get NaN (as in pandas)"""
+    def __init__(
+            self,
+            windows:list[int],            # Window lengths (number of time steps)
+            stats:tuple[str] = ('mean',), # Statistics: mean, std (ddof = 1), min, max
+        ):
+        for stat in stats:
+            if stat not in ('mean', 'std', 'min', 'max'):
+                sys.exit(f'Unknown rolling statistic: {stat}')
+        self.windows = sorted(set(windows))
+        self.stats = tuple(stats)
+        self.tail = None                  # Last (max window - 1) time steps of previous chunks
+
+
+    def update(
+            self,
+            chunk:np.array,               # New time steps of data (time, ...)
+            # Output variables:
+        ) -> dict:                        # (stat, window) --> values of windows ending in chunk
+        """Add new time chunk and get statistics of windows ending in it"""
+        chunk = np.asarray(chunk, dtype = np.float64)
+        nnew = chunk.shape[0]
+        values = chunk if self.tail is None else np.concatenate([self.tail, chunk])
+        ntime = values.shape[0]
+        # -- Cumulative sums are shifted by the first value (better precision
+        #    of std) and calculated only over carried tail and new chunk:
+        lnan = np.isnan(values)
+        if 'mean' in self.stats or 'std' in self.stats:
+            shift = np.nan_to_num(values[0])
+            data = np.where(lnan, 0.0, values - shift)
+            zeros = np.zeros((1,) + values.shape[1:])
+            csum = np.concatenate([zeros, np.cumsum(data, axis = 0)])
+            cnan = np.concatenate([zeros, np.cumsum(lnan, axis = 0)])
+            if 'std' in self.stats:
+                csq = np.concatenate([zeros, np.cumsum(data * data, axis = 0)])
+        res = {}
+        for window in self.windows:
+            # -- Full windows ending in the new chunk:
+            nout = min(nnew, ntime - window + 1)
+            if nout <= 0:
+                for stat in self.stats:
+                    res[(stat, window)] = np.empty((0,) + values.shape[1:])
+                continue
+            end = np.arange(ntime - nout + 1, ntime + 1)
+            if 'mean' in self.stats or 'std' in self.stats:
+                wsum = csum[end] - csum[end - window]
+                lvalid = (cnan[end] - cnan[end - window]) == 0
+            for stat in self.stats:
+                if stat == 'mean':
+                    out = wsum / window + shift
+                elif stat == 'std':
+                    wsq = csq[end] - csq[end - window]
+                    var = np.maximum(wsq - wsum * wsum / window, 0.0) / (window - 1)
+                    out = np.sqrt(var)
+                else:
+                    func = np.maximum if stat == 'max' else np.minimum
+                    out = rolling_extreme(values[ntime - nout - window + 1:], window, func)
+                    # -- NaN values are propagated by np.maximum/np.minimum:
+                if stat in ('mean', 'std'):
+                    out = np.where(lvalid, out, np.nan)
+                res[(stat, window)] = out
+        self.tail = values[max(ntime - (self.windows[-1] - 1), 0):]
+        return res
+
+
+def iter_rolling_stats(
+    # Input variables:
+    data:xr.DataArray,               # Research parameter (time, ...), can be lazy
+    windows:list[int],               # Window lengths (number of time steps)
+    stats:tuple[str] = ('mean',),    # Statistics: mean, std, min, max
+    time_axis:str = 'time',          # Name of time axis
+    tchunk:int = 3650,               # Number of time steps read in one chunk
+    ):                               # Yield (time of window ends, {(stat, window): values})
+    """Read data in time chunks and yield rolling statistics of each chunk
+       (memory does not depend on length of time series)"""
+    data = data.transpose(time_axis, ...)
+    engine = Rolling_stats(windows, stats)
+    ntime = data.shape[0]
+    for t0 in range(0, ntime, tchunk):
+        with l4pr.stage('read'):
+            chunk = data.isel({time_axis: slice(t0, t0 + tchunk)}).values
+        yield data[time_axis].values[t0:t0 + tchunk], engine.update(chunk)
+
+
+def get_rolling_stats(
+    # Input variables:
+    data:xr.DataArray,               # Research parameter (time, ...), can be lazy
+    windows:list[int],               # Window lengths (number of time steps)
+    stats:tuple[str] = ('mean',),    # Statistics: mean, std, min, max
+    time_axis:str = 'time',          # Name of time axis
+    tchunk:int = 3650,               # Number of time steps read in one chunk
+    # Output variables:
+    ) -> dict:                       # (stat, window) --> xr.DataArray (labels - ends of windows)
+    """Get rolling statistics for several windows in one pass over data.
+       Results are the same as pandas rolling(window) without NaN values
+       at the beginning of time series"""
+    data = data.transpose(time_axis, ...)
+    parts = {}
+    for time, res in iter_rolling_stats(data, windows, stats, time_axis, tchunk):
+        for key, values in res.items():
+            parts.setdefault(key, []).append((time[time.size - values.shape[0]:], values))
+    coords = {
+        name: coord for name, coord in data.coords.items() if time_axis not in coord.dims}
+    out = {}
+    for (stat, window), chunks in parts.items():
+        coords[time_axis] = np.concatenate([time for time, _ in chunks])
+        out[(stat, window)] = xr.DataArray(
+            np.concatenate([values for _, values in chunks]),
+            dims = data.dims,
+            coords = coords,
+            name = f'{data.name}_{stat}{window}',
+        )
+    return out
 
 
 class Get_ICON_QUINCY_data:
     def __init__(self):
         self.model = 'QUINCY'
+        self.time_axis = 'time'      # Name of time axis
+        self.cell_axis = 'ncells'    # Name of cell axis
+        self.area_var = 'cell_area'  # Name of cell area variable
+        self.tchunk = 120            # Number of time steps in one chunk for reductions
+        self.areas = {}              # Cell area values: (grid id, area path) --> np.array
 
 
-    def get_annual_ICON_data(
+    def get_ICON_dataset(
             # Input variables:
             self,
-            mode:str,                     # Mode (lplot or 2dmap)
-            fluxes:tuple[str],            # Research parameters presented as flux variable
-            var:str,                      # Research variable
-            **kwargs,                     # Other parameters (input paths, time limits)
+            **kwargs,                     # Other parameters (input path, time limits)
             # Output variables:
-        ) -> xr.DataArray:                # Annual values of the research parameters
-        """Get research ICON data for linear plots and 2D maps"""
-        # -- Local variables:
-        time_step = 'A'     # step for resample (A - annual)
-        time_axis = 'time'
-        area_var = 'cell_area'
+        ) -> xr.Dataset:                  # Research ICON dataset with time axis
+        """Get research ICON dataset with actual time axis"""
         # -- Get actual dataset path:
         if 'dpath' in kwargs and len(kwargs['dpath']) > 0:
             ds_path = kwargs['dpath']
         else:
             sys.exit('Add input path to the dataset')
-        # -- Get actual path to the dataset with cell area (only for lplot mode):
-        if 'apath' in kwargs and len(kwargs['apath']) > 0 and mode == 'lplot':
-            area_path = kwargs['apath']
         # -- Control input time range
         if 't1' not in kwargs and 't2' not in kwargs and 'tstep' not in kwargs:
             sys.exit('Add time range for datasets (e.q.: "t1 = t2 = 1990-01-01" and tstep = "1M"' )
-
-        # -- Activate unit converter
-        cnv_units = l4cnv.UnitConverter()
-
-        # -- Step 1: Get input data for work (research data)
-        nc = (
-            xr.open_dataset(ds_path, decode_times = False)
+        return (
+            open_ICON_dataset(ds_path, decode_times = False)
               .assign_coords(
-                  {time_axis: pd.date_range(
+                  {self.time_axis: pd.date_range(
                     kwargs['t1'],
                     kwargs['t2'],
                     freq = kwargs['tstep'],
                 )}
             )
         )
-        # Get extra data for linear plots:
-        if mode == 'lplot':
-            # -- Step 1.1: Get input data for work (research data and area_cell)
-            nc_area = xr.open_dataset(area_path)[area_var]
-            # -- Step 1.2: Fast control, if lat and lon values in two datasets are the same
-            if ((np.array_equal(np.rad2deg(nc.clon.values), np.rad2deg(nc_area.clon.values))) and
-                (np.array_equal(np.rad2deg(nc.clat.values), np.rad2deg(nc_area.clat.values)))) is True:
-                print ('Longutides and Latitudes are the same')
-            else:
-                sys.exit('Problem with grid cell lat or lon values!')
-            # -- Step 1.3: Add cell area values to dataset
-            nc['area'] = nc_area
-
-        # -- Step 2: Get correct units for linear plots
-        if var == 'assimi_gross_assimilation_box':
-            nc = cnv_units.gpp_converter(nc, var, mode)
-        elif var == 'veg_veg_pool_total_c_box':
-            nc = cnv_units.cveg_converter(nc, var, mode)
-        elif var == 'sb_emission_n2o_box':
-            nc = cnv_units.n2o_converter(nc, var, mode)
-        elif  var == 'sb_het_respiration_box':
-            nc = cnv_units.het_resp_converter(nc, var, mode)
-
-        # -- Step 3: Get annual values
-        if var in fluxes:
-            ds_new = nc[var].resample(time = time_step).sum(time_axis)
+
+
+    def get_cell_area(
+            # Input variables:
+            self,
+            nc:xr.Dataset,                # Research ICON dataset
+            area_path:str,                # Path to the dataset with cell area
+            # Output variables:
+        ) -> xr.DataArray:                # Cell area values
+        """Get cell area values for the grid of research dataset"""
+        if area_path is None or len(area_path) == 0:
+            sys.exit('Add input path to the dataset with cell area')
+        # -- Get input data for work (area_cell)
+        nc_area = open_ICON_dataset(area_path)
+        # -- Fast control, if lat and lon values in two datasets are the same
+        #    (grid identifiers are compared, coordinates - only for new grids):
+        if l4g.check_same_grid(nc, nc_area):
+            print ('Longutides and Latitudes are the same')
         else:
-            ds_new = nc[var].resample(time = time_step).mean(time_axis)
+            sys.exit('Problem with grid cell lat or lon values!')
+        return nc_area[self.area_var]
+
+
+    def get_area_weights(
+            # Input variables:
+            self,
+            nc:xr.Dataset,                # Research ICON dataset
+            area_path:str,                # Path to the dataset with cell area
+            how:str,                      # Type of reduction (sum or mean)
+            mask:np.array = None,         # Land mask or land fraction (optional)
+            # Output variables:
+        ) -> np.array:                    # Weights for cells
+        """Get area weights (normalized for mean values)"""
+        # -- Areas are checked once for each pair of research grid and area file:
+        key = (l4g.get_grid_id(nc), area_path)
+        if key not in self.areas:
+            self.areas[key] = self.get_cell_area(nc, area_path).values.astype(np.float64)
+        weights = self.areas[key]
+        if mask is not None:
+            weights = weights * np.nan_to_num(np.asarray(mask, dtype = np.float64))
+        if how == 'mean':
+            weights = weights / weights.sum()
+        return weights
+
+
+    @l4pr.profile('reduce')
+    def area_reduce(
+            # Input variables:
+            self,
+            data:xr.DataArray,            # Research parameter (time, cell)
+            weights:np.array,             # Weights for cells (see get_area_weights)
+            how:str,                      # Type of reduction (sum or mean)
+            # Output variables:
+        ) -> xr.DataArray:                # Global values of research parameter (time)
+        """Get area weighted global sums or means. Data are processed in
+           time chunks, scaled (time, cell) field is never created. Global
+           values are accumulated in float64 (also in reduced precision mode)"""
+        values = data.transpose(self.time_axis, self.cell_axis)
+        ntime = values.shape[0]
+        res = np.empty(ntime, dtype = np.float64)
+        for t0 in range(0, ntime, self.tchunk):
+            with l4pr.stage('read'):
+                chunk = np.asarray(values[t0:t0 + self.tchunk].values)
+            lvalid = ~np.isnan(chunk)
+            res[t0:t0 + self.tchunk] = np.where(lvalid, chunk, 0.0) @ weights
+            if how == 'mean':
+                # -- Only cells with values are used for mean values:
+                with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                    res[t0:t0 + self.tchunk] /= lvalid @ weights
+        return xr.DataArray(
+            res,
+            dims = self.time_axis,
+            coords = {self.time_axis: data[self.time_axis]},
+            name = data.name,
+        )
+
+
+    def get_cached_result(
+            # Input variables:
+            self,
+            method,                       # Method of the class with result
+            fluxes:tuple[str],            # Research parameters presented as flux variable
+            var:str,                      # Research variable
+            **kwargs,                     # Other parameters of the method
+            # Output variables:
+        ):                                # Result of the method (from cache or new one)
+        """Get result of the method from the on-disk cache (lcache = True)"""
+        kwargs['lcache'] = False
+        # -- Flux variables are presented only by membership of research variable:
+        key = get_cache_key(
+            method = method.__name__,
+            var = var,
+            lflux = var in fluxes,
+            version = l4cnv.UnitConverter().version,
+            dtype = l4s.float_type().__name__,
+            **kwargs,
+        )
+        res = read_cached_result(key)
+        if res is None:
+            res = method(fluxes = fluxes, var = var, **kwargs)
+            write_cached_result(key, res)
+        return res
+
+
+    def get_annual_ICON_data(
+            # Input variables:
+            self,
+            mode:str,                     # Mode (lplot or 2dmap)
+            fluxes:tuple[str],            # Research parameters presented as flux variable
+            var:str,                      # Research variable
+            **kwargs,                     # Other parameters (input paths, time limits, lweight, lcache)
+            # Output variables:
+        ) -> xr.DataArray:                # Annual values of the research parameters
+        """Get research ICON data for linear plots and 2D maps"""
+        if kwargs.get('lcache'):
+            return self.get_cached_result(
+                self.get_annual_ICON_data, fluxes, var, mode = mode, **kwargs)
+        # -- Activate unit converter
+        cnv_units = l4cnv.UnitConverter()
+
+        # -- Step 1: Get input data for work (research data)
+        nc = self.get_ICON_dataset(**kwargs)
+        # Get extra data for linear plots (cell area):
+        if mode == 'lplot':
+            nc['area'] = self.get_cell_area(nc, kwargs.get('apath'))
+
+        # -- Step 2: Get correct units for linear plots or 2D maps (conversion registry)
+        nc = cnv_units.convert(nc, var, mode, linplace = True)
+
+        # -- Step 3: Get annual values (state variables can be weighted by days in month)
+        ds_new = get_annual_values(
+            nc[var],
+            'sum' if var in fluxes else 'mean',
+            time_axis = self.time_axis,
+            lweight = kwargs.get('lweight', False),
+        )
+        # -- Keep grid identifier (coordinates can be taken from the grid registry):
+        if l4g.GRID_ATTR in nc.attrs:
+            ds_new.attrs[l4g.GRID_ATTR] = nc.attrs[l4g.GRID_ATTR]
         return ds_new
+
+
+    def get_global_ICON_data(
+            # Input variables:
+            self,
+            fluxes:tuple[str],            # Research parameters presented as flux variable
+            var:str,                      # Research variable
+            how:str,                      # Type of global reduction (sum or mean)
+            **kwargs,                     # Other parameters (input paths, time limits, lweight, mask, lcache)
+            # Output variables:
+        ) -> xr.DataArray:                # Annual global values of the research parameter
+        """Get annual area weighted global sums (units of linear plots)
+           or means (units of 2D maps) of research ICON data"""
+        if kwargs.get('lcache'):
+            return self.get_cached_result(
+                self.get_global_ICON_data, fluxes, var, how = how, **kwargs)
+        # -- Activate unit converter
+        cnv_units = l4cnv.UnitConverter()
+
+        # -- Step 1: Get input data for work (research data and area weights)
+        nc = self.get_ICON_dataset(**kwargs)
+        weights = self.get_area_weights(nc, kwargs.get('apath'), how, mask = kwargs.get('mask'))
+
+        # -- Step 2: Get global values of research data in original units (data
+        #            are read in time chunks, soil variables - integrated over layers)
+        data = cnv_units.get_total_values(nc, var)
+        ds_glob = self.area_reduce(data, weights, how)
+
+        # -- Step 3: Get correct units (per m2) of global values. Conversion is
+        #            linear, factors are applied to global values (time) only.
+        #            Sums are presented in units of linear plots:
+        factor = cnv_units.get_time_factor(var, '2dmap', ds_glob[self.time_axis])
+        if how == 'sum':
+            factor = factor * cnv_units.map2line_factor(var)
+        ds_glob = ds_glob * factor
+
+        # -- Step 4: Get annual values (global values are kept in float64)
+        return get_annual_values(
+            ds_glob,
+            'sum' if var in fluxes else 'mean',
+            time_axis = self.time_axis,
+            lweight = kwargs.get('lweight', False),
+            dtype = np.float64,
+        )
+
+
+    def get_annual_ICON_products(
+            # Input variables:
+            self,
+            fluxes:tuple[str],            # Research parameters presented as flux variable
+            var:str,                      # Research variable
+            how:str,                      # Type of global reduction for linear plots (sum or mean)
+            **kwargs,                     # Other parameters (input paths, time limits, lweight, mask, lcache)
+            # Output variables:
+        ) -> dict:                        # Annual values: {'lplot': global values, '2dmap': cell values}
+        """Get research ICON data for linear plots and 2D maps in one pass"""
+        if kwargs.get('lcache'):
+            return self.get_cached_result(
+                self.get_annual_ICON_products, fluxes, var, how = how, **kwargs)
+        # -- Activate unit converter
+        cnv_units = l4cnv.UnitConverter()
+
+        # -- Step 1: Get input data for work (research data and area weights)
+        nc = self.get_ICON_dataset(**kwargs)
+        weights = self.get_area_weights(nc, kwargs.get('apath'), how, mask = kwargs.get('mask'))
+
+        # -- Step 2: Get correct units (per m2) for research data (converted cell
+        #            field is needed only for 2D maps)
+        nc = cnv_units.convert(nc, var, '2dmap', linplace = True)
+
+        # -- Step 3: Get annual values for 2D maps
+        ds_map = get_annual_values(
+            nc[var],
+            'sum' if var in fluxes else 'mean',
+            time_axis = self.time_axis,
+            lweight = kwargs.get('lweight', False),
+        )
+        if l4g.GRID_ATTR in nc.attrs:
+            ds_map.attrs[l4g.GRID_ATTR] = nc.attrs[l4g.GRID_ATTR]
+
+        # -- Step 4: Get annual global values for linear plots (annual values
+        #            are linear in monthly values, so 2D map values are reduced).
+        #            Cells without values in the year (e.g. sea) have zero annual
+        #            sums in 2D maps and aren't used for global mean values:
+        if how == 'mean':
+            nvalid = get_annual_values(
+                nc[var].notnull(), 'sum', time_axis = self.time_axis, dtype = np.float64)
+            ds_line = self.area_reduce(ds_map.where(nvalid.values > 0), weights, how)
+        else:
+            ds_line = self.area_reduce(ds_map, weights, how)
+        if how == 'sum':
+            ds_line = ds_line * cnv_units.map2line_factor(var)
+        return {'lplot': ds_line, '2dmap': ds_map}
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Description: Module with stage-level profiling of ICON processing. Wall time,
+             CPU time, bytes read and peak memory are collected for stages
+             (read, convert, resample, reduce, render, savefig) and saved as
+             JSON and CSV reports. Profiling is switched on by the environment
+             variable ICON_PROFILE=1 (report is saved at exit of the script)
+             or by the context manager profiling(). Peak memory is the peak
+             RSS of the process; with ICON_PROFILE=mem it's the peak of memory
+             allocated in the stage (tracemalloc, slower run).
+
+Authors: Evgenii Churiulin
+
+Current Code Owner: MPI-BGC, Evgenii Churiulin
+phone:  +49  170 261-5104
+email:  evgenychur@bgc-jena.mpg.de
+
+History:
+Version    Date       Name
+---------- ---------- ----
+    1.1    17.10.2026 Evgenii Churiulin, MPI-BGC
+           Initial release
+"""
+# =============================     Import modules     ======================
+import os
+import sys
+import csv
+import json
+import time
+import atexit
+import functools
+import tracemalloc
+from contextlib import contextmanager
+from typing import Optional
+try:
+    import resource                  # Unix only
+except ImportError:
+    resource = None
+# =============================   Global variables   ===================
+PROFILE_ENV = 'ICON_PROFILE'         # Environment variable: 1 - switch on profiling,
+                                     #                       mem - also trace memory of stages
+PROFILE_DIR_ENV = 'ICON_PROFILE_DIR' # Environment variable: folder for reports
+_enabled = False                     # Profiling is active
+_ltrace = False                      # Memory of stages is traced by tracemalloc
+_stats = {}                          # Stage --> collected values
+_frames = []                         # Stack of active stages (for nested stages)
+
+# =============================   Personal functions   =================
+def bytes_read() -> int:
+    """ Get number of bytes read by the process (0, if /proc isn't available) """
+    try:
+        with open('/proc/self/io') as fio:
+            for line in fio:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def peak_rss() -> int:
+    """ Get peak RSS of the process in bytes (0, if resource isn't available) """
+    if resource is None:
+        return 0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # -- ru_maxrss is in bytes on macOS and in KiB on other Unix systems:
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def enable(ltrace:bool = False):
+    """ Switch on profiling (ltrace - trace memory of stages by tracemalloc) """
+    global _enabled, _ltrace
+    if ltrace and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled = True
+    _ltrace = ltrace
+
+
+def disable():
+    """ Switch off profiling (collected values are kept) """
+    global _enabled, _ltrace
+    if _ltrace and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _enabled = False
+    _ltrace = False
+
+
+@contextmanager
+def stage(
+    # Input parameters:
+    name:str,                        # Name of stage (read, convert, resample, ...)
+    ):
+    """ Collect wall time, CPU time, bytes read and peak memory of the stage.
+        Nested stages are also included in values of outer stages """
+    if not _enabled:
+        yield
+        return
+    # -- Peak memory of outer stage is saved before reset:
+    if _ltrace:
+        if _frames:
+            _frames[-1]['peak'] = max(_frames[-1]['peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    frame = {'peak': 0}
+    _frames.append(frame)
+    wall, cpu, nbytes = time.perf_counter(), time.process_time(), bytes_read()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        nbytes = bytes_read() - nbytes
+        if _ltrace:
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+        else:
+            peak = peak_rss()
+        _frames.pop()
+        if _frames:
+            _frames[-1]['peak'] = max(_frames[-1]['peak'], peak)
+        values = _stats.setdefault(
+            name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'bytes_read': 0, 'peak_mem_mib': 0.0})
+        values['calls'] += 1
+        values['wall_s'] += wall
+        values['cpu_s'] += cpu
+        values['bytes_read'] += nbytes
+        values['peak_mem_mib'] = max(values['peak_mem_mib'], peak / 2**20)
+
+
+def profile(name:str):
+    """ Decorator: collect values of the function as the stage """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_stats() -> dict:
+    """ Get copy of collected values (stage --> values) """
+    return {name: dict(values) for name, values in _stats.items()}
+
+
+def reset():
+    """ Remove collected values """
+    _stats.clear()
+
+
+def write_report(
+    # Input parameters:
+    pout:Optional[str] = None,       # Output path without extension (default: profile_<script>_<pid>)
+    # Output parameters:
+    ) -> Optional[str]:              # Output path (None, if there are no values)
+    """ Save collected values as JSON and CSV reports """
+    if not _stats:
+        return None
+    if pout is None:
+        script = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'python'
+        pout = os.path.join(
+            os.environ.get(PROFILE_DIR_ENV, os.getcwd()), f'profile_{script}_{os.getpid()}')
+    stats = get_stats()
+    with open(f'{pout}.json', 'w') as fjson:
+        json.dump({
+            'script': sys.argv[0],
+            'memory': 'tracemalloc' if _ltrace else 'peak_rss',
+            'stages': stats,
+        }, fjson, indent = 2)
+    with open(f'{pout}.csv', 'w', newline = '') as fcsv:
+        writer = csv.writer(fcsv)
+        writer.writerow(['stage', 'calls', 'wall_s', 'cpu_s', 'bytes_read', 'peak_mem_mib'])
+        for name, values in stats.items():
+            writer.writerow([name] + list(values.values()))
+    return pout
+
+
+@contextmanager
+def profiling(
+    # Input parameters:
+    pout:Optional[str] = None,       # Output path of reports without extension
+    ltrace:bool = False,             # Trace memory of stages by tracemalloc
+    ):
+    """ Profile the block of code and save reports at exit """
+    enable(ltrace)
+    try:
+        yield
+    finally:
+        write_report(pout)
+        disable()
+
+
+# -- Profiling of the whole script run (ICON_PROFILE=1):
+if os.environ.get(PROFILE_ENV, '0') not in ('', '0'):
+    enable(ltrace = os.environ[PROFILE_ENV] == 'mem')
+    atexit.register(write_report)
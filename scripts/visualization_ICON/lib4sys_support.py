@@ -19,6 +19,7 @@ Version    Date       Name
 
 # =============================     Import modules     ==================
 import os
+import numpy as np
 import pandas as pd
 # =============================   Personal functions   ==================
 def dep_clean(path:str):
@@ -72,3 +73,25 @@ def output_path():
     msub = 'Users/evchur/Python/scripts/github/icon_data_processing/RESULTS'
     sep = '/'
     return os_path(drive, msub, sep = sep)
+
+
+def cache_path(name:str) -> str:
+    """Create path for cached data of icon_data_processing scripts"""
+    root = os.environ.get(
+        'ICON_CACHE_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'icon_data_processing'),
+    )
+    return makefolder(os.path.join(root, name))
+
+
+def float_type() -> type:
+    """Get float type for data processing (reduced precision mode: ICON_FLOAT32 = 1)"""
+    return np.float32 if os.environ.get('ICON_FLOAT32', '0') == '1' else np.float64
+
+
+def as_float_type(values) -> np.array:
+    """Convert float data to float32 in reduced precision mode (other data aren't changed)"""
+    values = np.asarray(values)
+    if float_type() is np.float32 and values.dtype.kind == 'f':
+        return values.astype(np.float32, copy = False)
+    return values
@@ -22,6 +22,11 @@ import xarray as xr
 import warnings
 warnings.filterwarnings("ignore")
 
+import lib4sys_support as l4s
+import lib4profiling as l4pr
+# =============================   Global variables   ===================
+_layer_thickness = {}               # Soil layer depths --> soil layer thickness
+
 # =============================   Personal functions   =================
 class UnitConverter:
     def __init__(self):
@@ -35,95 +40,167 @@ class UnitConverter:
         self.g2tg         = 1e-12   # g in Tg (teragram)
         self.kg2pg        = 1e-12   # kg in PgC
         self.area = 'area'
+        self.version = '1.1'        # version of conversions (part of cached results key)
+        # -- Soil variables (have to be integrated over layers before conversion):
+        self.layer_vars = {'sb_het_respiration_box' : 'soil_layer_sb'}
+        # -- Conversion registry. All scalar constants are folded in one factor:
+        #    (variable, mode) --> (scalar factor, use days in month, use cell area)
+        umol_c2g = self.micromol2mol * self.molc2gramm * self.sec_1day
+        umol_n2o2g = 2 * self.micromol2mol * self.moln2gramm * self.sec_1day
+        self.registry = {
+            # GPP: μmolC m-2 s-1 -> molC m-2 s-1 -> gC m-2 s-1 ->
+            #      -> PgC m-2 s-1 -> PgC s-1 -> PgC yr-1
+            ('assimi_gross_assimilation_box', 'lplot') : (umol_c2g * self.gc2pgc, True, True),
+            # GPP: μmolC m-2 s-1 -> molC m-2 s-1 -> gC m-2 yr-1
+            ('assimi_gross_assimilation_box', '2dmap') : (umol_c2g, True, False),
+            # cVeg: molC m-2 --> gC m-2 -> PgC m-2 -> PgC
+            ('veg_veg_pool_total_c_box', 'lplot') : (self.molc2gramm * self.gc2pgc, False, True),
+            # cVeg: mol C m-2 --> kgC m-2
+            ('veg_veg_pool_total_c_box', '2dmap') : (self.molc2gramm / self.gc2kgc, False, False),
+            # N2O: μmol N2O m-2 s-1 -> μmol N m-2 s-1 -> mol N m-2 s-1 -> gN m-2 s-1 ->
+            #      -> Tg N m-2 s-1 -> TgN s-1 -> TgN yr-1
+            ('sb_emission_n2o_box', 'lplot') : (umol_n2o2g * self.g2tg, True, True),
+            # N2O: μmol N2O m-2 s-1 -> μmol N m-2 s-1 -> mol N m-2 s-1 -> gN m-2 yr-1
+            ('sb_emission_n2o_box', '2dmap') : (umol_n2o2g, True, False),
+            # Het. respiration (after integration over layers):
+            #      μmol C m-2 s-1 -> mol C m-2 s-1 -> gC m-2 s-1 -> PgC m-2 s-1 -> PgC s-1 -> PgC yr-1
+            ('sb_het_respiration_box', 'lplot') : (umol_c2g * self.gc2pgc, True, True),
+            # Het. respiration: μmol m-2 s-1 --> mol C m-2 s-1 --> gC m-2 s-1 --> gC m-2 yr-1
+            ('sb_het_respiration_box', '2dmap') : (umol_c2g, True, False),
+        }
+
+
+    @l4pr.profile('convert')
+    def convert(
+            self,
+            ds:xr.Dataset,          # Dataset with research variable (and cell area for lplot)
+            var:str,                # Research variable
+            mode:str,               # Mode (lplot or 2dmap)
+            linplace:bool = False,  # Multiply data in place (data of ds are changed)
+        ) -> xr.Dataset:            # Dataset with converted research variable
+        """Convert units of research variable based on the conversion registry.
+           Time (days in month) and cell (area) factors are combined by outer
+           product and applied in one multiplication"""
+        # -- Variables without conversion (e.g. LAI):
+        if (var, mode) not in self.registry:
+            return ds
+        larea = self.registry[(var, mode)][2]
+        # -- Soil variables: get total values over layers
+        ds[var] = self.get_total_values(ds, var)
+        data = ds[var]
+        # -- Combined factor (time, 1, ..., cell):
+        shape = (-1,) + (1,) * (data.ndim - 1)
+        tfactor = self.get_time_factor(var, mode, data.time).reshape(shape)
+        if larea:
+            tfactor = tfactor * ds[self.area].values
+        tfactor = tfactor.astype(l4s.float_type(), copy = False)
+        # -- Apply factor:
+        with l4pr.stage('read'):
+            values = l4s.as_float_type(data.values)
+        if linplace and values.dtype == np.result_type(values, tfactor):
+            values = np.multiply(values, tfactor, out = values)
+        else:
+            values = values * tfactor
+        ds[var] = data.copy(data = values)
+        return ds
+
+
+    def get_time_factor(
+            self,
+            var:str,                # Research variable
+            mode:str,               # Mode (lplot or 2dmap)
+            time:xr.DataArray,      # Time axis of research variable
+        ) -> np.array:              # Conversion factor for each time step (without cell area)
+        """Get scalar and time (days in month) conversion factors for time steps.
+           Conversion is linear, so it can be applied to global values (time)
+           instead of the full (time, cell) field"""
+        if (var, mode) not in self.registry:
+            return np.ones(time.size)
+        factor, ltime, _ = self.registry[(var, mode)]
+        if ltime:
+            return time.dt.days_in_month.values * factor
+        return np.full(time.size, factor)
+
+
+    def get_total_values(
+            self,
+            ds:xr.Dataset,          # Dataset with research variable
+            var:str,                # Research variable
+        ) -> xr.DataArray:          # Research variable (soil variables - sum over layers)
+        """Get research variable without conversion of units. Soil variables
+           are integrated over layers (in time chunks), other variables
+           aren't read"""
+        if var not in self.layer_vars:
+            return ds[var]
+        layer_dim = self.layer_vars[var]
+        hlayers = self.get_layer_thickness(ds[layer_dim].values)
+        return self.integrate_layers(ds[var], hlayers, layer_dim)
+
+
+    def get_layer_thickness(self, levels:np.array) -> np.array:
+        """Get soil layer thickness based on depths of layers (calculated
+           only once for each set of depths)"""
+        key = tuple(np.asarray(levels).tolist())
+        if key not in _layer_thickness:
+            _layer_thickness[key] = np.abs(np.diff(np.concatenate(([0.0], key))))
+        return _layer_thickness[key]
+
+
+    def integrate_layers(
+            self,
+            data:xr.DataArray,      # Research parameter (time, layer, ...)
+            hlayers:np.array,       # Soil layer thickness
+            layer_dim:str,          # Name of layer axis
+            tchunk:int = 120,       # Number of time steps in one chunk
+        ) -> xr.DataArray:          # Depth weighted sum over layers (time, ...)
+        """Get depth weighted sum over soil layers. Data are read and
+           contracted in time chunks (NaN values are ignored)"""
+        data = data.transpose(data.dims[0], layer_dim, ...)
+        hlayers = hlayers.astype(l4s.float_type(), copy = False)
+        ntime = data.shape[0]
+        res = np.empty((ntime,) + data.shape[2:], dtype = np.result_type(data.dtype, hlayers))
+        for t0 in range(0, ntime, tchunk):
+            with l4pr.stage('read'):
+                chunk = l4s.as_float_type(data[t0:t0 + tchunk].values)
+            chunk = np.where(np.isnan(chunk), 0.0, chunk)
+            res[t0:t0 + tchunk] = np.tensordot(chunk, hlayers, axes = ([1], [0]))
+        dims = tuple(dim for dim in data.dims if dim != layer_dim)
+        coords = {
+            name: coord for name, coord in data.coords.items() if layer_dim not in coord.dims}
+        return xr.DataArray(res, dims = dims, coords = coords, name = data.name)
+
+
+    def map2line_factor(self, var:str) -> float:
+        """Get factor for conversion of 2D map units (per m2) to units of
+           linear plots (per m2, cell area is applied separately)"""
+        if (var, 'lplot') not in self.registry:
+            return 1.0
+        return self.registry[(var, 'lplot')][0] / self.registry[(var, '2dmap')][0]
 
 
     def gpp_converter(self, ds:xr.DataArray,var:str, mode:str):
         """Convert GPP units from:
             1. Linear plot: μmolC m-2 s-1 --> PgC yr-1;
             2. 2D Map: μmolC m-2 s-1 -> gC m-2 yr-1"""
-        # -- 1. Units for linear plot:
-        if mode == 'lplot':
-            # μmolC m-2 s-1 -> molC m-2 s-1 -> gC m-2 s-1 ->
-            # -> PgC m-2 s-1 -> PgC s-1 -> PgC yr-1
-            ds[var] = (
-                ds[var] * self.micromol2mol * self.molc2gramm * self.sec_1day *
-                ds[var].time.dt.days_in_month * self.gc2pgc * ds[self.area])
-        # -- 2. Units for 2D maps:
-        if mode == '2dmap':
-            # μmolC m-2 s-1 -> molC m-2 s-1 -> gC m-2 yr-1
-            ds[var] = (
-                ds[var] * self.micromol2mol * self.molc2gramm * self.sec_1day *
-                ds[var].time.dt.days_in_month)
-        return ds
+        return self.convert(ds, var, mode)
 
 
     def cveg_converter(self, ds:xr.DataArray,var:str, mode:str):
         """Convert cVeg units from:
             1. Linear plot: molC m-2 -> PgC
             2. 2D Map: molC s-1 --> kgC"""
-        # -- 1. Units for linear plot:
-        if mode == 'lplot':
-            # molC m-2 --> gC m-2 -> PgC m-2 -> PgC
-            ds[var] = ds[var] * self.molc2gramm * self.gc2pgc * ds[self.area]
-        # -- 2. Units for 2D maps:
-        if mode == '2dmap':
-            # mol C s-1 --> kgC
-            ds[var] = ds[var] * self.molc2gramm / self.gc2kgc
-        return ds
+        return self.convert(ds, var, mode)
 
 
     def n2o_converter(self, ds:xr.DataArray,var:str, mode:str):
         """Convert N2O units from:
             1. Linear plot: μmol N2O m-2 s-1 to TgN yr-1
             2. 2D Map: μmol N2O m-2 s-1 -> gN m-2 yr-1"""
-
-        # Step 1: μmol N2O m-2 s-1 -> μmol N m-2 s-1
-        ds[var] = (ds[var] ) * 2
-        # -- 1. Units for linear plot:
-        if mode == 'lplot':
-            # μmol N m-2 s-1 -> mol N m-2 s-1 -> gN m-2 s-1 -> Tg N m-2 s-1 -> TgN s-1 -> TgN yr-1
-            ds[var] = (
-                ds[var] * self.micromol2mol * self.moln2gramm * self.sec_1day *
-                ds[var].time.dt.days_in_month * self.g2tg * ds[self.area])
-        # -- 2. Units for 2D maps:
-        if mode == '2dmap':
-            # μmol N m-2 s-1 -> mol N m-2 s-1 -> gN m-2 s-1
-            ds[var] = (
-                ds[var] * self.micromol2mol * self.moln2gramm * self.sec_1day *
-                ds[var].time.dt.days_in_month)
-        return ds
+        return self.convert(ds, var, mode)
 
 
     def het_resp_converter(self, ds:xr.DataArray,var:str, mode:str):
         """Converter heterotrophic respiration from:
             1. Linear plot: μmol C m-3 s-1 to PgC yr-1
             2. 2D Map: μmol C m-3 s-1 to gC m-2 yr-1"""
-        # -- Step 1: Get actual layer depths:
-        soil_layers = ds['soil_layer_sb'].values
-        hlayers = []
-        for i in range(len(soil_layers)):
-            if i == 0:
-                lev_diff = 0 - soil_layers[i]
-            else:
-                lev_diff = soil_layers[i-1] - soil_layers[i]
-            hlayers.append(abs(lev_diff))
-        # -- Step 2: Convert μmol C m-3 s-1 --> μmol C m-2 s-1
-        for i in range(len(soil_layers)):
-            ds[var][:,i,:] = ds[var][:,i,:] * hlayers[i]
-        # Get total values over layers:
-        ds[var] = ds[var].sum(dim = {'soil_layer_sb'})
-        # -- 1. Units for linear plot:
-        if mode == 'lplot':
-            # -- Step 3: Convert
-            # μmol C m-2 s-1 -> mol C m-2 s-1 -> gC m-2 s-1 -> PgC m-2 s-1 -> PgC s-1 -> PgC yr-1
-            ds[var] = (
-                ds[var] * self.micromol2mol * self.molc2gramm * self.sec_1day *
-                ds[var].time.dt.days_in_month * self.gc2pgc * ds[self.area])
-        # -- 2. Units for 2D maps:
-        if mode == '2dmap':
-            # Convert:
-            # μmol m-2 s-1 --> mol C m-2 s-1 --> gC m-2 s-1 --> gC m-2 yr-1
-            ds[var] = (
-                ds[var] * self.micromol2mol * self.molc2gramm * self.sec_1day *
-                ds[var].time.dt.days_in_month)
-        return ds
+        return self.convert(ds, var, mode)
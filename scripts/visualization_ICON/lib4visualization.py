@@ -16,12 +16,19 @@ Version    Date       Name
 """
 
 # =============================     Import modules     =======================
+import os
 import time
+import functools
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import numpy as np
 import xarray as xr
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
+import matplotlib.tri as mtri
+from matplotlib.collections import PolyCollection
 from matplotlib import colors
 import cartopy.crs as ccrs
 import cartopy
@@ -31,6 +38,14 @@ from typing import Optional
 import warnings
 warnings.filterwarnings("ignore")
 
+import lib4sys_support as l4s
+import lib4grid as l4g
+import lib4profiling as l4pr
+# =============================   Global variables   ========================
+_triangulations = {}                 # Grid identifier --> triangulation of cell centres
+_shared_grid = {}                    # Grid of render_maps workers (clon, clat, bnds)
+_canvases = {}                       # Map templates of render_maps workers
+
 # =============================   Personal functions   ======================
 # Function --> tick_rotation_size
 def xticks_settings(ax:plt.Axes, rotation:float, fsize:int):
@@ -49,11 +64,13 @@ def yticks_settings(ax:plt.Axes, rotation:float, fsize:int):
 
 
 def timer(func):
-    """Time calculator"""
+    """Time calculator (time is also saved as render stage of the profiling report)"""
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         #-- retrieve start time
         t1 = time.time()
-        res = func(*args, **kwargs)
+        with l4pr.stage('render'):
+            res = func(*args, **kwargs)
         # -- retrieve stop time
         t2 = time.time()
         #-- get wallclock time
@@ -62,6 +79,170 @@ def timer(func):
     return wrapper
 
 
+def get_triangulation(
+    # Input parameters:
+    clon : np.array,                                      # longitude
+    clat : np.array,                                      # latitude
+    # Output parameters:
+    ) -> mtri.Triangulation:                              # Triangulation of cell centres
+    """Get Delaunay triangulation of ICON cell centres. Triangulation is
+       calculated once for each grid and saved in the grid registry"""
+    gid = l4g.coords_id(clon, clat)
+    if gid not in _triangulations:
+        triangles = l4g.get_grid_product(
+            gid, 'triangles', lambda: mtri.Triangulation(clon, clat).triangles)
+        _triangulations[gid] = mtri.Triangulation(clon, clat, np.asarray(triangles))
+    return _triangulations[gid]
+
+
+def split_dateline_cells(
+    # Input parameters:
+    clon_bnds : np.array,                                 # longitude of cell vertices (ncells, nv)
+    clat_bnds : np.array,                                 # latitude of cell vertices (ncells, nv)
+    # Output parameters:
+    ) -> tuple[
+        np.array,                                         # polygon vertices (npolygons, nv, 2)
+        np.array,                                         # cell index of each polygon
+    ]:
+    """Get ICON cell polygons. Cells crossing the dateline are split in
+       eastern and western copies"""
+    lon = (np.asarray(clon_bnds, dtype = np.float64) + 180.0) % 360.0 - 180.0
+    lat = np.asarray(clat_bnds, dtype = np.float64)
+    lcross = (lon.max(axis = 1) - lon.min(axis = 1)) > 180.0
+    # -- Eastern copy (vertices in the western hemisphere are shifted to the east):
+    east = lon[lcross]
+    east = np.where(east < 0.0, east + 360.0, east)
+    # -- Western copy (vertices in the eastern hemisphere are shifted to the west):
+    west = lon[lcross]
+    west = np.where(west > 0.0, west - 360.0, west)
+    verts = np.stack([
+        np.concatenate([lon[~lcross], east, west]),
+        np.concatenate([lat[~lcross], lat[lcross], lat[lcross]]),
+    ], axis = -1)
+    index = np.concatenate([
+        np.flatnonzero(~lcross), np.flatnonzero(lcross), np.flatnonzero(lcross)])
+    return verts, index
+
+
+def get_cell_polygons(
+    # Input parameters:
+    clon_bnds : np.array,                                 # longitude of cell vertices (in degree)
+    clat_bnds : np.array,                                 # latitude of cell vertices (in degree)
+    # Output parameters:
+    ) -> tuple[
+        np.array,                                         # polygon vertices (npolygons, nv, 2)
+        np.array,                                         # cell index of each polygon
+    ]:
+    """Get ICON cell polygons (calculated once for each grid and saved in
+       the grid registry)"""
+    gid = l4g.coords_id(clon_bnds, clat_bnds)
+    verts = l4g.get_grid_product(
+        gid, 'poly_verts', lambda: split_dateline_cells(clon_bnds, clat_bnds)[0])
+    index = l4g.get_grid_product(
+        gid, 'poly_index', lambda: split_dateline_cells(clon_bnds, clat_bnds)[1])
+    return verts, index
+
+
+def add_cell_polygons(
+    # Input parameters:
+    ax : plt.Axes,                                        # map axes
+    data : np.array,                                      # ICON data for visualization
+    bnds : tuple[np.array],                               # cell vertices (clon_bnds, clat_bnds) in degree
+    **kwargs,                                             # style of polygons (cmap, norm, zorder)
+    # Output parameters:
+    ) -> tuple[
+        PolyCollection,                                   # ICON cells on the map
+        np.array,                                         # index of ICON cell for each polygon
+    ]:
+    """Draw each ICON cell as a polygon (NaN values are transparent)"""
+    verts, index = get_cell_polygons(*bnds)
+    cells = PolyCollection(
+        verts,
+        array = np.ma.masked_invalid(np.asarray(data)[index]),
+        edgecolors = 'face',
+        linewidths = 0.0,
+        transform = ccrs.PlateCarree(),
+        **kwargs,
+    )
+    ax.add_collection(cells)
+    return cells, index
+
+
+def update_cell_polygons(
+    # Input parameters:
+    cells : PolyCollection,                               # ICON cells on the map (see add_cell_polygons)
+    data : np.array,                                      # new ICON data for visualization
+    index : np.array,                                     # index of ICON cell for each polygon
+    ):
+    """Update face colours of ICON cells with new data"""
+    cells.set_array(np.ma.masked_invalid(np.asarray(data)[index]))
+
+
+def get_raster_shape(
+    # Input parameters:
+    res : float,                                          # resolution of regular raster (in degree)
+    # Output parameters:
+    ) -> tuple[int, int]:                                 # number of pixels (nlat, nlon)
+    """Get size of the global regular raster. Pixels aren't larger than res
+       and cover the globe exactly (-180..180, -90..90), if res doesn't divide
+       180 degree"""
+    return int(np.ceil(180.0 / res - 1e-9)), int(np.ceil(360.0 / res - 1e-9))
+
+
+def get_raster_index(
+    # Input parameters:
+    clon : np.array,                                      # longitude (in degree)
+    clat : np.array,                                      # latitude (in degree)
+    res : float,                                          # resolution of regular raster (in degree)
+    # Output parameters:
+    ) -> np.array:                                        # index of nearest ICON cell (nlat, nlon)
+    """Get index map from pixels of a regular lat-lon raster to the nearest
+       ICON cells (calculated once for each grid and resolution and saved in
+       the grid registry)"""
+    def unit_vectors(lon, lat):
+        lon, lat = np.deg2rad(lon), np.deg2rad(lat)
+        return np.stack([
+            np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis = -1)
+
+    def build():
+        # -- scipy is needed only for the first map on a new grid:
+        from scipy.spatial import cKDTree
+        # -- Pixel centres from north-west corner (as for imshow, origin = 'upper'):
+        lat = 90.0 - (np.arange(nlat) + 0.5) * (180.0 / nlat)
+        lon = -180.0 + (np.arange(nlon) + 0.5) * (360.0 / nlon)
+        plon, plat = np.meshgrid(lon, lat)
+        tree = cKDTree(unit_vectors(np.asarray(clon, np.float64), np.asarray(clat, np.float64)))
+        index = tree.query(unit_vectors(plon, plat).reshape(-1, 3))[1]
+        return index.astype(np.int32).reshape(plon.shape)
+
+    nlat, nlon = get_raster_shape(res)
+    gid = l4g.coords_id(clon, clat)
+    return l4g.get_grid_product(gid, f'remap_{nlat}x{nlon}', build)
+
+
+def add_raster_image(
+    # Input parameters:
+    ax : plt.Axes,                                        # map axes
+    data : np.array,                                      # ICON data for visualization
+    clon : np.array,                                      # longitude (in degree)
+    clat : np.array,                                      # latitude (in degree)
+    res : float,                                          # resolution of regular raster (in degree)
+    **kwargs,                                             # style of image (cmap, norm, zorder)
+    # Output parameters:
+    ):                                                    # ICON data on the map
+    """Draw ICON data remapped to a regular lat-lon raster (NaN values are
+       transparent)"""
+    index = get_raster_index(clon, clat, res)
+    return ax.imshow(
+        np.ma.masked_invalid(np.asarray(data)[index]),
+        origin = 'upper',
+        extent = [-180.0, 180.0, -90.0, 90.0],
+        interpolation = 'nearest',
+        transform = ccrs.PlateCarree(),
+        **kwargs,
+    )
+
+
 class Plot_settings:
     def __init__(self):
         # Set common parameters for all figures:
@@ -87,6 +268,9 @@ class Plot_settings:
         self.mbbox = 'tight'    #
         self.lw_coast = 0.5     # Size of coastline
         self.zord_coast = 2.0   # zoom order of coastline
+        self.mres = 0.5         # Resolution of raster maps (render = 'raster', in degree)
+        self.mwidth = 10        # Map width
+        self.mlength = 10       # Map length
 
 
     def plt_uset_maps(self, ax, uset):
@@ -94,6 +278,14 @@ class Plot_settings:
         # -- Add plot title to 2D map:
         if 'title' in uset and len(uset.get('title')) > 0:
             plt.title(uset.get('title'))
+        # -- Add coastlines and grid to 2D map:
+        self.plt_map_layout(ax, uset)
+        # -- Save figure:
+        self.plt_map_save(plt.gcf(), uset)
+
+
+    def plt_map_layout(self, ax, uset):
+        """ Coastlines and grid of 2D map"""
         # -- Add coastlines to 2D map:
         if 'lcoastline' in uset and uset.get('lcoastline'):
             ax.coastlines(linewidth = self.lw_coast, zorder = self.zord_coast)
@@ -107,20 +299,16 @@ class Plot_settings:
                 zorder = self.mgzord,
             )
 
-        # -- Save figure:
+
+    def plt_map_save(self, fig, uset):
+        """ Save 2D map (or show it, if output path isn't set)"""
         if 'pout_map' in uset and len(uset.get('pout_map')) > 0:
             if 'prefix' in uset and len(uset.get('prefix')) > 0:
-                plt.savefig(
-                    f"{uset.get('pout_map')}_{uset.get('prefix')}.{self.plt_format}",
-                    bbox_inches = self.mbbox,
-                    dpi = self.msave_dpi,
-                )
+                pout = f"{uset.get('pout_map')}_{uset.get('prefix')}.{self.plt_format}"
             else:
-                plt.savefig(
-                    f"{uset.get('pout_map')}.{self.plt_format}",
-                    bbox_inches = self.mbbox,
-                    dpi = self.msave_dpi,
-                )
+                pout = f"{uset.get('pout_map')}.{self.plt_format}"
+            with l4pr.stage('savefig'):
+                fig.savefig(pout, bbox_inches = self.mbbox, dpi = self.msave_dpi)
         else:
             plt.show()
 
@@ -195,15 +383,122 @@ class Plot_settings:
         # -- Set output parameters:
         if 'output' in uset and len(uset.get('output')) > 0:
             #-- Plot save
-            plt.savefig(
-                f"{uset.get('output')}.{self.plt_format}",
-                format = self.plt_format,
-                dpi = self.plt_dpi,
-            )
+            with l4pr.stage('savefig'):
+                ax.figure.savefig(
+                    f"{uset.get('output')}.{self.plt_format}",
+                    format = self.plt_format,
+                    dpi = self.plt_dpi,
+                )
         else:
             plt.show()
 
 
+class Map_canvas:
+    """Reusable 2D map. Figure, projection, coastlines, gridlines and colorbar
+       axes are created once, for each new map only data layer, colorbar,
+       legend and title are replaced"""
+    def __init__(
+        self,
+        set4plot:dict,                                    # user settings (lcoastline, lgrid_map)
+        lcbar:bool = True,                                # add axes for colorbar
+        ):
+        self.settings = Plot_settings()
+        self.fig, self.ax = plt.subplots(
+            figsize = (self.settings.mwidth, self.settings.mlength),
+            subplot_kw = dict(projection = ccrs.PlateCarree()),
+        )
+        # -- Make the map global rather than have it zoom in to the extents of any plotted data
+        self.ax.set_global()
+        self.settings.plt_map_layout(self.ax, set4plot)
+        #-- Axes for color bar:              x,    y,    w,    h
+        self.cbar_ax = self.fig.add_axes([0.2, 0.25, 0.6, 0.015], autoscalex_on = True) if lcbar else None
+        self.layer = None                                 # data layer of the map
+        self.cbar = None                                  # colorbar of the data layer
+        self.cell_index = None                            # index of ICON cell for each polygon of
+                                                          # the data layer (cell polygons only)
+
+
+    def detach_colorbar(self):
+        """Disconnect colorbar from the data layer (changes of the reused
+           layer don't redraw the colorbar of the previous map)"""
+        if self.cbar is not None:
+            mappable = self.cbar.mappable
+            mappable.callbacks.disconnect(mappable.colorbar_cid)
+            mappable.colorbar = None
+            self.cbar = None
+
+
+    def set_layer(self, layer):
+        """Replace data layer of the map"""
+        self.detach_colorbar()
+        if self.layer is not None:
+            self.layer.remove()
+        self.layer = layer
+        self.cell_index = None
+        return layer
+
+
+    def set_cells(self, data, bnds, **kwargs):
+        """Replace data layer by ICON cell polygons. Polygons of the previous
+           map on the same grid are reused, only their colours are updated"""
+        index = get_cell_polygons(*bnds)[1]
+        if self.cell_index is not None and self.cell_index is index:
+            self.detach_colorbar()
+            update_cell_polygons(self.layer, data, index)
+            self.layer.set(**kwargs)
+            return self.layer
+        cells, index = add_cell_polygons(self.ax, data, bnds, **kwargs)
+        self.set_layer(cells)
+        self.cell_index = index
+        return cells
+
+
+    def set_colorbar(self, layer, units):
+        """Replace colorbar of the map"""
+        self.detach_colorbar()
+        self.cbar_ax.clear()
+        self.cbar = self.fig.colorbar(layer, cax = self.cbar_ax, orientation = 'horizontal')
+        plt.setp(self.cbar.ax.get_xticklabels()[::2], visible = False)
+        self.cbar.set_label(f'[{units}]')
+        return self.cbar
+
+
+    def save(self, set4plot):
+        """Set title and save the map"""
+        # -- Title is placed above the last created axes (as plt.title in plt_uset_maps):
+        title_ax = self.ax if self.cbar_ax is None else self.cbar_ax
+        title_ax.set_title(set4plot.get('title', ''))
+        self.settings.plt_map_save(self.fig, set4plot)
+
+
+    def close(self):
+        """Close figure of the map"""
+        plt.close(self.fig)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+@contextmanager
+def use_canvas(
+    # Input parameters:
+    set4plot : dict,                                      # user settings (lcoastline, lgrid_map)
+    canvas : Optional[Map_canvas] = None,                 # existing map template
+    lcbar : bool = True,                                  # add axes for colorbar (new template)
+    ):
+    """Use existing map template or create new one, which is closed on exit"""
+    if canvas is not None:
+        yield canvas
+        return
+    with Map_canvas(set4plot, lcbar = lcbar) as canvas:
+        yield canvas
+
+
 @timer
 def plot_mask(
     # Input parameters:
@@ -211,52 +506,69 @@ def plot_mask(
     clon : np.array,                                      # longitude
     clat : np.array,                                      # latitude
     set4plot: dict,                                       # user settings
-    **kwargs,                                             # other parameters (optional)
+    **kwargs,                                             # other parameters (optional):
+                                                          # prefix, tri - triangulation,
+                                                          # render - 'contour' (default), 'poly' or 'raster',
+                                                          # bnds - (clon_bnds, clat_bnds) for 'poly',
+                                                          # res - raster resolution in degree for 'raster',
+                                                          # canvas - Map_canvas(set4plot, lcbar = False)
     # Output parameters:
     ):                                                    # Create 2D map in the output folder
     """Visualization of land sea mask"""
     # -- Local variables:
-    mwidth = 10
-    mlength = 10
     ncols = 2                                             # number of columns for legend
-    maps_settings = Plot_settings()                       # user settings class
-    projection = ccrs.PlateCarree()                       # type of projection
     sea_color = set4plot.get('sea_color')                 # pixel colors for water
     land_color = set4plot.get('land_color')               # pixel colors for land
     cmap = colors.ListedColormap([sea_color, land_color]) # colormap based on input colors
 
-    #-- Create figure and axes instances; we need subplots for plot and colorbar
-    fig, ax = plt.subplots(
-        figsize = (mwidth, mlength),
-        subplot_kw = dict(projection = projection),
-    )
-    # -- Make the map global rather than have it zoom in to the extents of any plotted data
-    ax.set_global()
-    #-- Contour plot:
-    cnf = ax.tricontourf(
-        clon,
-        clat,
-        data,
-        vmin = set4plot.get('vmin'),
-        vmax = set4plot.get('vmax'),
-        cmap = cmap,
-    )
+    #-- Map template is taken from kwargs or created (and closed) for this map:
+    with use_canvas(set4plot, kwargs.get('canvas'), lcbar = False) as canvas:
+        ax = canvas.ax
+        if kwargs.get('render') == 'poly':
+            #-- Cell polygons (cell vertices are taken from kwargs - bnds):
+            cnf = canvas.set_cells(
+                data,
+                kwargs['bnds'],
+                cmap = cmap,
+                norm = colors.Normalize(set4plot.get('vmin'), set4plot.get('vmax')),
+            )
+        elif kwargs.get('render') == 'raster':
+            #-- Regular raster (index map of nearest cells is taken from the cache):
+            cnf = canvas.set_layer(add_raster_image(
+                ax,
+                data,
+                clon,
+                clat,
+                kwargs.get('res', canvas.settings.mres),
+                cmap = cmap,
+                norm = colors.Normalize(set4plot.get('vmin'), set4plot.get('vmax')),
+            ))
+        else:
+            #-- Contour plot (triangulation is taken from kwargs or from the cache):
+            tri = kwargs.get('tri') or get_triangulation(clon, clat)
+            cnf = canvas.set_layer(ax.tricontourf(
+                tri,
+                data,
+                vmin = set4plot.get('vmin'),
+                vmax = set4plot.get('vmax'),
+                cmap = cmap,
+            ))
 
-    #-- Add legend:
-    leg_sea  = mpatches.Rectangle((0, 0), 1, 1, facecolor = sea_color)
-    leg_land = mpatches.Rectangle((0, 0), 1, 1, facecolor = land_color)
-    plt.legend(
-        [leg_sea, leg_land],
-        set4plot.get('labels'),
-        loc = 'lower center',
-        fancybox = True,
-        ncol = ncols,
-        bbox_to_anchor = (0.5, -0.2),
-    )
-    if 'prefix' in kwargs and len(kwargs['prefix']) > 0:
-        set4plot['prefix'] = kwargs['prefix']
-    # -- Set other user settings parameters:
-    maps_settings.plt_uset_maps(ax, set4plot)
+        #-- Add legend:
+        leg_sea  = mpatches.Rectangle((0, 0), 1, 1, facecolor = sea_color)
+        leg_land = mpatches.Rectangle((0, 0), 1, 1, facecolor = land_color)
+        ax.legend(
+            [leg_sea, leg_land],
+            set4plot.get('labels'),
+            loc = 'lower center',
+            fancybox = True,
+            ncol = ncols,
+            bbox_to_anchor = (0.5, -0.2),
+        )
+        if 'prefix' in kwargs and len(kwargs['prefix']) > 0:
+            set4plot['prefix'] = kwargs['prefix']
+        # -- Set title and save figure:
+        canvas.save(set4plot)
 
 
 @timer
@@ -266,23 +578,24 @@ def icon_data(
     clon : np.array,                                      # longitude
     clat : np.array,                                      # latitude
     set4plot: dict,                                       # user settings
-    **kwargs,                                             # other parameters (optional)
+    **kwargs,                                             # other parameters (optional):
+                                                          # var, prefix, tri - triangulation,
+                                                          # render - 'contour' (default), 'poly' or 'raster',
+                                                          # bnds - (clon_bnds, clat_bnds) for 'poly',
+                                                          # res - raster resolution in degree for 'raster',
+                                                          # canvas - Map_canvas(set4plot)
     # Output parameters:
     ):                                                    # Create 2D map in the output folder
     """ Visialization of the research ICON parameter """
     # -- Local variables:
-    mwidth = 10
-    mlength = 10
     nanvals = -9999
     cmap_extend = 'neither'
-    maps_settings = Plot_settings()                       # user settings class
-    projection = ccrs.PlateCarree()                       # type of projection
     varMin = set4plot.get('varMin')                       # min values
     varMax = set4plot.get('varMax')                       # max values
     varInt = set4plot.get('varInt')                       # step between values
     units = set4plot.get('units')                         # units for labels
     #-- Replace NaN values
-    data4plot = np.nan_to_num(data, nan = nanvals)
+    data4plot = np.nan_to_num(l4s.as_float_type(data), nan = nanvals)
     # -- Set contour levels, labels:
     levels = np.arange(varMin, varMax+varInt, varInt)
     nlevs  = levels.size
@@ -296,37 +609,150 @@ def icon_data(
     print('Variable min/max: %6.2f ' % np.nanmin(data)+'/'+' %.2f' % np.nanmax(data))
     print('Contour  min/max: %6.2f ' % varMin+'/'+' %.2f' % varMax)
     print('')
-    #-- Create figure and axes instances; we need subplots for plot and colorbar:
-    fig, ax = plt.subplots(
-        figsize=(mwidth, mlength),
-        subplot_kw=dict(projection=projection),
-    )
-    ax.set_global()
-    # -- Contour plot
-    cnf = ax.tricontourf(
-        clon,
-        clat,
-        data4plot,
-        vmin = varMin,
-        vmax  = varMax,
-        levels = levels,
-        cmap = cmap,
-        extend = cmap_extend,
-        zorder = 0,
-    )
-    #-- Add a color bar      x,    y,    w,    h
-    cbar_ax = fig.add_axes([0.2, 0.25, 0.6, 0.015], autoscalex_on = True) 
-    cbar = fig.colorbar(cnf, cax=cbar_ax, orientation = 'horizontal')
-    plt.setp(cbar.ax.get_xticklabels()[::2], visible = False)
-    cbar.set_label(f'[{units}]')
-    # Add prefix to figure:
-    if 'prefix' in kwargs and len(kwargs['prefix']) > 0:
-        set4plot['prefix'] = kwargs['prefix']
-    # -- Set other user settings parameters:
-    maps_settings.plt_uset_maps(ax, set4plot)
+    #-- Map template is taken from kwargs or created (and closed) for this map:
+    with use_canvas(set4plot, kwargs.get('canvas')) as canvas:
+        ax = canvas.ax
+        if kwargs.get('render') == 'poly':
+            # -- Cell polygons (cell vertices are taken from kwargs - bnds).
+            #    Values out of contour levels aren't filled (as in contour plot):
+            cnf = canvas.set_cells(
+                data,
+                kwargs['bnds'],
+                cmap = cmap.with_extremes(under = 'none', over = 'none'),
+                norm = colors.BoundaryNorm(levels, cmap.N),
+                zorder = 0,
+            )
+        elif kwargs.get('render') == 'raster':
+            # -- Regular raster (index map of nearest cells is taken from the cache):
+            cnf = canvas.set_layer(add_raster_image(
+                ax,
+                data,
+                clon,
+                clat,
+                kwargs.get('res', canvas.settings.mres),
+                cmap = cmap.with_extremes(under = 'none', over = 'none'),
+                norm = colors.BoundaryNorm(levels, cmap.N),
+                zorder = 0,
+            ))
+        else:
+            # -- Contour plot (triangulation is taken from kwargs or from the cache):
+            tri = kwargs.get('tri') or get_triangulation(clon, clat)
+            cnf = canvas.set_layer(ax.tricontourf(
+                tri,
+                data4plot,
+                vmin = varMin,
+                vmax  = varMax,
+                levels = levels,
+                cmap = cmap,
+                extend = cmap_extend,
+                zorder = 0,
+            ))
+        #-- Add a color bar:
+        canvas.set_colorbar(cnf, units)
+        # Add prefix to figure:
+        if 'prefix' in kwargs and len(kwargs['prefix']) > 0:
+            set4plot['prefix'] = kwargs['prefix']
+        # -- Set title and save figure:
+        canvas.save(set4plot)
+
+
+def _attach_shared_grid(
+    # Input parameters:
+    blocks : dict,                                        # name --> (shared memory name, shape, dtype)
+    ):
+    """Initialization of render_maps worker: attach grid arrays from shared
+       memory (without copies) and switch to the non-interactive backend"""
+    plt.switch_backend('Agg')
+    for name, (shm_name, shape, dtype) in blocks.items():
+        shm = shared_memory.SharedMemory(name = shm_name)
+        _shared_grid[f'_shm_{name}'] = shm                # keep memory block alive
+        _shared_grid[name] = np.ndarray(shape, dtype = dtype, buffer = shm.buf)
+
+
+def _render_map_job(
+    # Input parameters:
+    job : dict,                                           # map job (see render_maps)
+    ):
+    """Create one 2D map on the grid of the render_maps worker"""
+    job = dict(job)
+    name = job.pop('map', 'icon_data')
+    func = {'icon_data': icon_data, 'plot_mask': plot_mask}[name]
+    data = job.pop('data')
+    set4plot = job.pop('set4plot')
+    # -- Map template is reused by all maps of the same type and layout:
+    key = (name, bool(set4plot.get('lcoastline')), bool(set4plot.get('lgrid_map')))
+    if key not in _canvases:
+        _canvases[key] = Map_canvas(set4plot, lcbar = name == 'icon_data')
+    job.setdefault('canvas', _canvases[key])
+    if 'bnds' in _shared_grid:
+        job.setdefault('bnds', (_shared_grid['bnds'][0], _shared_grid['bnds'][1]))
+    func(data, _shared_grid['clon'], _shared_grid['clat'], set4plot, **job)
+
+
+def render_maps(
+    # Input parameters:
+    jobs : list[dict],                                    # map jobs: data, set4plot, map - 'icon_data'
+                                                          # (default) or 'plot_mask' and other kwargs of
+                                                          # map function (var, prefix, render, res)
+    clon : np.array,                                      # longitude (common for all jobs)
+    clat : np.array,                                      # latitude (common for all jobs)
+    nproc : Optional[int] = None,                         # number of processes (default: all cores)
+    bnds : Optional[tuple[np.array]] = None,              # cell vertices (clon_bnds, clat_bnds) for 'poly'
+    # Output parameters:
+    ):                                                    # Create 2D maps in the output folders
+    """Create 2D maps in a pool of processes. Grid arrays are shared between
+       processes through shared memory, each process renders with Agg backend
+       and reuses one map template for maps of the same type"""
+    grid = {'clon': np.asarray(clon), 'clat': np.asarray(clat)}
+    if bnds is not None:
+        grid['bnds'] = np.stack([np.asarray(bnds[0]), np.asarray(bnds[1])])
+    # -- Data are sent to processes as numpy arrays (xarray objects are larger):
+    jobs = [dict(job, data = np.asarray(job['data'])) for job in jobs]
+    nproc = min(nproc or os.cpu_count(), len(jobs))
+    if nproc <= 1:
+        _shared_grid.clear()
+        _shared_grid.update(grid)
+        for job in jobs:
+            _render_map_job(job)
+        for canvas in _canvases.values():
+            canvas.close()
+        _canvases.clear()
+        _shared_grid.clear()
+        return
+
+    # -- Grid products are calculated once before start of processes:
+    if any(job.get('render', 'contour') == 'contour' for job in jobs):
+        get_triangulation(grid['clon'], grid['clat'])
+    for job in jobs:
+        if job.get('render') == 'raster':
+            get_raster_index(grid['clon'], grid['clat'], job.get('res', Plot_settings().mres))
+    if bnds is not None:
+        get_cell_polygons(grid['bnds'][0], grid['bnds'][1])
 
+    # -- Copy grid arrays to shared memory:
+    blocks = {}
+    shms = []
+    try:
+        for name, values in grid.items():
+            shm = shared_memory.SharedMemory(create = True, size = max(values.nbytes, 1))
+            shms.append(shm)
+            np.ndarray(values.shape, dtype = values.dtype, buffer = shm.buf)[...] = values
+            blocks[name] = (shm.name, values.shape, values.dtype.str)
+        with ProcessPoolExecutor(
+                max_workers = nproc,
+                initializer = _attach_shared_grid,
+                initargs = (blocks,)) as pool:
+            # -- list() raises errors of processes in the main process (stages
+            #    of processes aren't profiled, only total time of the pool):
+            with l4pr.stage('render_pool'):
+                list(pool.map(_render_map_job, jobs))
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
 
 
+@l4pr.profile('render')
 def get_line_plot(
     # Input parameters:
     mode : str,                                          # Type of input data for visualization
@@ -365,4 +791,3 @@ def get_line_plot(
     maps_settings.plt_uset_line(ax, set4plot)
     #-- Clean memory
     plt.close(fig)
-    plt.gcf().clear()
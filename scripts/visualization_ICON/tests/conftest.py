@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+Description: Common settings for tests of icon_data_processing modules
+             (modules are imported from the parent folder, maps are created
+             with the non-interactive backend, cached data are saved in a
+             temporary folder)
+"""
+import os
+import sys
+
+import matplotlib
+import pytest
+
+matplotlib.use('Agg')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse = True)
+def cache_dir(tmp_path, monkeypatch):
+    """Cached grid products and results are saved in a temporary folder"""
+    monkeypatch.setenv('ICON_CACHE_DIR', str(tmp_path / 'cache'))
+    return tmp_path / 'cache'
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Description: Annual values of regular time axes (get_annual_values: reshape
+             and reduceat) against the baseline aggregation by years
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+import lib4processing as l4p
+
+
+def get_data(freq:str, years:int = 4, ncells:int = 50) -> xr.DataArray:
+    """Synthetic (time, cell) data with NaN values"""
+    time = pd.date_range('2000-01-01', f'{2000 + years - 1}-12-31', freq = freq)
+    rng = np.random.default_rng(1)
+    values = rng.uniform(0.0, 10.0, (time.size, ncells))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    values[:, 0] = np.nan
+    return xr.DataArray(values, dims = ('time', 'ncells'), coords = {'time': time}, name = 'var')
+
+
+def get_baseline(data:xr.DataArray, how:str, lweight:bool) -> np.array:
+    """Annual values by groups of years (days in month are weights of mean values)"""
+    years = data.groupby('time.year')
+    if how == 'sum':
+        return years.sum('time').values
+    if not lweight:
+        return years.mean('time').values
+    weights = data.time.dt.days_in_month.astype(np.float64).where(data.notnull())
+    return (
+        (data * weights).groupby('time.year').sum('time') /
+        weights.groupby('time.year').sum('time')
+    ).values
+
+
+@pytest.mark.parametrize('freq', ['MS', 'D'])
+@pytest.mark.parametrize('how', ['sum', 'mean'])
+@pytest.mark.parametrize('lweight', [False, True])
+def test_annual_values(freq, how, lweight):
+    data = get_data(freq)
+    res = l4p.get_annual_values(data, how, lweight = lweight)
+    assert res.dims == data.dims
+    assert res.time.dt.year.values.tolist() == [2000, 2001, 2002, 2003]
+    np.testing.assert_allclose(res.values, get_baseline(data, how, lweight), rtol = 1e-12)
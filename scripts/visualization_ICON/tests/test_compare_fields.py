@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Description: Vectorized comparison of fields (compare_fields) for float,
+             unsigned integer and boolean data with and without tolerances
+"""
+import numpy as np
+import pytest
+
+import lib4processing as l4p
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'atol': 1e-6}, {'rtol': 1e-3}])
+def test_nan_against_number(kwargs):
+    res = l4p.compare_fields(np.array([1.0, np.nan, 3.0]), np.array([1.0, 2.0, 3.0]), **kwargs)
+    assert res['count'] == 1
+    assert res['index'].tolist() == [1]
+
+
+def test_nan_in_both_fields():
+    res = l4p.compare_fields(np.array([np.nan, 1.0]), np.array([np.nan, 1.5]), atol = 0.1)
+    assert res['count'] == 1
+    assert res['nan_equal'] == 1
+    assert res['max_diff'] == 0.5
+
+
+def test_unsigned_integers():
+    var1 = np.array([1, 0, 5], dtype = np.uint8)
+    var2 = np.array([3, 1, 5], dtype = np.uint8)
+    res = l4p.compare_fields(var1, var2)
+    assert res['count'] == 2
+    assert res['max_diff'] == 2.0
+    # -- Differences within tolerance (0 vs 1 with atol = 1):
+    res = l4p.compare_fields(var1, var2, atol = 1)
+    assert res['index'].tolist() == [0]
+    assert res['max_diff'] == 2.0
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'atol': 0.5}])
+def test_booleans(kwargs):
+    res = l4p.compare_fields(np.array([True, False, True]), np.array([True, True, False]), **kwargs)
+    assert res['index'].tolist() == [1, 2]
+    assert res['max_diff'] == 1.0
+
+
+def test_2d_indices():
+    var1 = np.zeros((2, 3))
+    var2 = var1.copy()
+    var2[1, 2] = 1.0
+    res = l4p.compare_fields(var1, var2, chunk_size = 4)
+    assert res['count'] == 1
+    assert [idx.tolist() for idx in res['index']] == [[1], [2]]
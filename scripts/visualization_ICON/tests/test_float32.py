@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Description: Drift of the reduced precision mode (ICON_FLOAT32 = 1) against
+             the float64 path for synthetic (time, cell) data: unit
+             conversion, annual values and area weighted global values
+             (global values are float64 in both modes)
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+import lib4processing as l4p
+import lib4unit_conversion as l4cnv
+
+VAR = 'assimi_gross_assimilation_box'
+
+
+def get_dataset(ntime:int = 60, ncells:int = 2000) -> xr.Dataset:
+    """Synthetic monthly GPP (μmolC m-2 s-1) with NaN values (sea cells)"""
+    rng = np.random.default_rng(42)
+    values = rng.uniform(0.0, 15.0, (ntime, ncells))
+    values[:, rng.random(ncells) < 0.3] = np.nan
+    return xr.Dataset(
+        {VAR: (('time', 'ncells'), values)},
+        coords = {'time': pd.date_range('2000-01-01', periods = ntime, freq = 'MS')},
+    )
+
+
+def run_pipeline(monkeypatch, flag:str, how:str) -> tuple[np.array, np.array]:
+    """Annual 2D map values and global values in the selected precision mode"""
+    monkeypatch.setenv('ICON_FLOAT32', flag)
+    ds = l4cnv.UnitConverter().convert(get_dataset(), VAR, '2dmap')
+    annual = l4p.get_annual_values(ds[VAR], 'sum', lweight = False)
+    areas = np.random.default_rng(7).uniform(1e9, 4e9, ds.sizes['ncells'])
+    weights = areas / areas.sum() if how == 'mean' else areas
+    glob = l4p.Get_ICON_QUINCY_data().area_reduce(annual, weights, how)
+    return annual.values, glob.values
+
+
+@pytest.mark.parametrize('how', ['mean', 'sum'])
+def test_float32_drift(monkeypatch, how):
+    annual64, glob64 = run_pipeline(monkeypatch, '0', how)
+    annual32, glob32 = run_pipeline(monkeypatch, '1', how)
+    assert annual64.dtype == np.float64
+    assert annual32.dtype == np.float32
+    # -- Same cells without values, bounded drift of values:
+    np.testing.assert_array_equal(np.isnan(annual32), np.isnan(annual64))
+    np.testing.assert_allclose(annual32, annual64, rtol = 1e-5)
+    # -- Global values are accumulated in float64 in both modes:
+    assert glob32.dtype == np.float64
+    np.testing.assert_allclose(glob32, glob64, rtol = 1e-6)
+
+
+def write_files(path) -> dict:
+    """Synthetic ICON dataset and cell area dataset (NetCDF) on the same grid"""
+    ds = get_dataset(ntime = 36, ncells = 500)
+    ncells = ds.sizes['ncells']
+    grid = {
+        'coords': {
+            'clon': ('ncells', np.linspace(-3.0, 3.0, ncells)),
+            'clat': ('ncells', np.linspace(-1.5, 1.5, ncells)),
+        },
+        'attrs': {'uuidOfHGrid': 'test-grid'},
+    }
+    ds = ds.assign_coords(time = np.arange(36.0), **grid['coords'])
+    ds.attrs.update(grid['attrs'])
+    ds.to_netcdf(path / 'data.nc')
+    area = xr.Dataset(
+        {'cell_area': ('ncells', np.random.default_rng(7).uniform(1e9, 4e9, ncells))},
+        coords = grid['coords'],
+        attrs = grid['attrs'],
+    )
+    area.to_netcdf(path / 'area.nc')
+    return {
+        'dpath': str(path / 'data.nc'), 'apath': str(path / 'area.nc'),
+        't1': '2000-01-01', 't2': '2002-12-01', 'tstep': 'MS',
+    }
+
+
+@pytest.mark.parametrize('how', ['mean', 'sum'])
+def test_global_values_float64(tmp_path, monkeypatch, how):
+    kwargs = write_files(tmp_path)
+    res = {}
+    for flag in ('0', '1'):
+        monkeypatch.setenv('ICON_FLOAT32', flag)
+        quincy = l4p.Get_ICON_QUINCY_data()
+        res[flag] = (
+            quincy.get_global_ICON_data((VAR,), VAR, how, **kwargs),
+            quincy.get_annual_ICON_products((VAR,), VAR, how, **kwargs),
+        )
+    for flag, (glob, products) in res.items():
+        # -- Global values for linear plots are float64 in both modes:
+        assert glob.dtype == np.float64, flag
+        assert products['lplot'].dtype == np.float64, flag
+    assert res['1'][1]['2dmap'].dtype == np.float32
+    np.testing.assert_allclose(res['1'][0].values, res['0'][0].values, rtol = 1e-6)
+    np.testing.assert_allclose(res['1'][1]['lplot'].values, res['0'][1]['lplot'].values, rtol = 1e-6)
+    # -- Both ways of global values give the same result (cells without values
+    #    aren't used for mean values):
+    np.testing.assert_allclose(res['0'][0].values, res['0'][1]['lplot'].values, rtol = 1e-10)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Description: Memory regression test of 2D maps. Hundreds of maps are created
+             by icon_data and plot_mask (Agg backend), all figures have to be
+             closed and RSS of the process has to stay bounded
+"""
+import gc
+
+import numpy as np
+import matplotlib.pyplot as plt
+import psutil
+
+import lib4visualization as l4v
+
+NWARMUP = 100                        # Number of warm-up maps (RSS grows up to ~200 maps)
+NMAPS = 200                          # Number of maps (half of them - land/sea masks)
+MAX_GROWTH_MIB = 20                  # Max RSS growth after warm-up maps
+
+
+def get_grid(nlon:int = 36, nlat:int = 18) -> tuple[np.array, np.array]:
+    """Synthetic grid (cell centres)"""
+    lon, lat = np.meshgrid(
+        np.linspace(-175.0, 175.0, nlon), np.linspace(-85.0, 85.0, nlat))
+    return lon.ravel(), lat.ravel()
+
+
+def test_maps_are_closed(tmp_path):
+    clon, clat = get_grid()
+    rng = np.random.default_rng(0)
+    set4data = {
+        'varMin': 0.0, 'varMax': 1.0, 'varInt': 0.1, 'units': '-', 'cmap': 'viridis',
+        'title': 'data', 'pout_map': str(tmp_path / 'data'),
+    }
+    set4mask = {
+        'sea_color': 'blue', 'land_color': 'green', 'labels': ['sea', 'land'],
+        'vmin': 0, 'vmax': 1, 'title': 'mask', 'pout_map': str(tmp_path / 'mask'),
+    }
+    process = psutil.Process()
+
+    def create_maps(nmaps:int):
+        for i in range(nmaps // 2):
+            l4v.icon_data(rng.random(clon.size), clon, clat, set4data, var = 'data', prefix = f'{i}')
+            l4v.plot_mask(rng.integers(0, 2, clon.size), clon, clat, set4mask, prefix = f'{i}')
+
+    # -- Warm-up (caches of matplotlib and fonts, triangulation of the grid):
+    create_maps(NWARMUP)
+    gc.collect()
+    rss0 = process.memory_info().rss
+    create_maps(NMAPS)
+    gc.collect()
+    growth = (process.memory_info().rss - rss0) / 2**20
+    assert plt.get_fignums() == []
+    assert growth < MAX_GROWTH_MIB, f'RSS growth {growth:.1f} MiB after {NMAPS} maps'